@@ -0,0 +1,147 @@
+"""
+合成データで分類・結合と分割の一括処理(本番の経路)・A4変換・ログ出力の各段階を計測し、結果をJSONで出力する
+
+    python -m benchmarks.run_bench --subfolders 5 --out bench_result.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from dataclasses import fields
+
+import fitz  # PyMuPDF
+
+from benchmarks.synthetic import SyntheticConfig, generate_tree
+from hr_assist.bundle_index import INDEX_SUFFIX
+from hr_assist.classify import classify_files, clean_filename, sort_key
+from hr_assist.log_writers import open_log_writer
+from hr_assist.merge import merge_group
+from hr_assist.resize import merge_group_as_a4
+from hr_assist.scan import group_by_subfolder, scan_input
+from hr_assist.status_ledger import StatusLedger
+
+STAGES = ['classify', 'stream', 'resize', 'log']
+
+
+@contextlib.contextmanager
+def timed(timings: dict, stage: str):
+    """
+    ブロックの実行時間をtimings[stage]に加算する (処理中の標準出力は計測から外すため捨てる)
+    """
+    started = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_benchmark(work_root: str, config: SyntheticConfig, limit_size: int, stages: list) -> dict:
+    input_root = os.path.join(work_root, 'input_combine')
+    output_root = os.path.join(work_root, 'output')
+    os.makedirs(output_root, exist_ok=True)
+
+    started = time.perf_counter()
+    generated = generate_tree(input_root, config)
+    generate_seconds = time.perf_counter() - started
+
+    timings = {}
+    ledger = StatusLedger()
+    groups = []
+
+    # 分類は後続の段階の前提になるため常に実行する (本番と同じく入力フォルダを1度だけ走査してから分類する)
+    with timed(timings, 'classify'):
+        subfolders = group_by_subfolder(scan_input(input_root))
+        for subfolder_name, subfolder_files in subfolders.items():
+            file_groups = classify_files([scanned_file.path for scanned_file in subfolder_files], ledger)
+            for row, files in file_groups.items():
+                groups.append((subfolder_name, row, sorted(files, key=sort_key)))
+
+    parts = 0
+    # 本番の経路 (ページ単位で出力パートに追記しながら分割する1回の処理)
+    if 'stream' in stages:
+        stream_root = os.path.join(work_root, 'output_stream')
+        for subfolder_name, row, files in groups:
+            sub_output_folder_path = os.path.join(stream_root, clean_filename(subfolder_name))
+            os.makedirs(sub_output_folder_path, exist_ok=True)
+            with timed(timings, 'stream'):
+                group_statuses, output_paths, _ = merge_group(subfolder_name, row, files, sub_output_folder_path)
+            ledger.apply(group_statuses)
+            parts += sum(not path.endswith(INDEX_SUFFIX) for path in output_paths)
+
+    if 'resize' in stages:
+        resize_root = os.path.join(work_root, 'output_a4')
+        for subfolder_name, row, files in groups:
+            sub_output_folder_path = os.path.join(resize_root, clean_filename(subfolder_name))
+            os.makedirs(sub_output_folder_path, exist_ok=True)
+            with timed(timings, 'resize'):
+                merge_group_as_a4(subfolder_name, row, files, sub_output_folder_path)
+
+    if 'log' in stages:
+        records = ledger.to_records()
+        for log_format in ('csv', 'jsonl', 'xlsx'):
+            with timed(timings, f'log_{log_format}'):
+                log_writer = open_log_writer(log_format, output_root, f"benchmark_{log_format}")
+                log_writer.write_rows(records)
+                log_writer.close(records)
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pymupdf': fitz.VersionBind,
+        'platform': platform.platform(),
+        'config': config.to_dict(),
+        'limit_size': limit_size,
+        'generated': {**generated, 'groups': len(groups), 'seconds': round(generate_seconds, 3)},
+        'split_parts': parts,
+        'timings': {stage: round(seconds, 4) for stage, seconds in timings.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成データでhr_assistの各段階の処理時間を計測する")
+    defaults = SyntheticConfig()
+    for field in fields(SyntheticConfig):
+        option = '--' + field.name.replace('_', '-')
+        if field.type is bool or isinstance(getattr(defaults, field.name), bool):
+            parser.add_argument(option, type=lambda v: v.lower() in ('1', 'true', 'yes'),
+                                default=getattr(defaults, field.name))
+        else:
+            parser.add_argument(option, type=type(getattr(defaults, field.name)),
+                                default=getattr(defaults, field.name))
+    parser.add_argument('--limit-mb', type=float, default=9, help="分割の上限サイズ(MB)")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"計測する段階をカンマ区切りで指定 ({','.join(STAGES)})")
+    parser.add_argument('--work-dir', help="合成データと出力を置くフォルダ (省略時は一時フォルダを作成して最後に削除)")
+    parser.add_argument('--out', default='bench_result.json', help="結果JSONの出力先")
+    args = parser.parse_args(argv)
+
+    config = SyntheticConfig(**{field.name: getattr(args, field.name) for field in fields(SyntheticConfig)})
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+
+    work_root = args.work_dir or tempfile.mkdtemp(prefix='hr_assist_bench_')
+    try:
+        result = run_benchmark(work_root, config, int(args.limit_mb * 1024 * 1024), stages)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    json.dump(result['timings'], sys.stdout, indent=2)
+    print(f"\n計測結果を {args.out} に出力しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import random
+from dataclasses import dataclass, asdict
+
+import fitz  # PyMuPDF
+
+from hr_assist.classify import rows
+
+# 全角カタカナと対応する半角カタカナ (ファイル名の先頭文字用)
+FULL_WIDTH_KANA = ''.join(rows.values())
+HALF_WIDTH_KANA = 'ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜｦﾝ'
+
+# 混在させる用紙サイズ (A4が多め)
+PAGE_SIZES = ['a4', 'a4', 'a4', 'letter', 'b5', 'a3-l']
+
+
+@dataclass
+class SyntheticConfig:
+    """
+    合成するinput_combineフォルダの形
+    既定値は本番規模 (50部署 × 10行 × 10ファイル = 5,000ファイル)
+    """
+    subfolders: int = 50
+    pdfs_per_row: int = 10
+    pages_per_pdf: int = 2
+    image_ratio: float = 0.3
+    image_pixels: int = 300
+    mixed_sizes: bool = True
+    half_width_ratio: float = 0.3
+    resume_folder_ratio: float = 0.1
+    seed: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _file_name(rng: random.Random, row_chars: str, index: int, half_width_ratio: float) -> str:
+    first = rng.choice(row_chars)
+    if rng.random() < half_width_ratio:
+        first = HALF_WIDTH_KANA[FULL_WIDTH_KANA.index(first)]
+    rest = ''.join(rng.choice(FULL_WIDTH_KANA) for _ in range(3))
+    return f"{first}{rest}_{index:04d}.pdf"
+
+
+def _write_pdf(path: str, rng: random.Random, config: SyntheticConfig):
+    doc = fitz.open()
+    for page_num in range(config.pages_per_pdf):
+        paper = rng.choice(PAGE_SIZES) if config.mixed_sizes else 'a4'
+        width, height = fitz.paper_size(paper)
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((72, 72), f"{os.path.basename(path)} page {page_num + 1}", fontsize=12)
+        if rng.random() < config.image_ratio:
+            # スキャン画像の代わりに圧縮の効かないノイズ画像を貼る (最悪ケースのサイズになる)
+            size = config.image_pixels
+            pix = fitz.Pixmap(fitz.csRGB, size, size, rng.randbytes(size * size * 3), 0)
+            page.insert_image(fitz.Rect(72, 100, width - 72, height - 72), pixmap=pix)
+        else:
+            for line in range(30):
+                page.insert_text((72, 100 + line * 14), "Lorem ipsum dolor sit amet " * 3, fontsize=9)
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+
+
+def generate_tree(root: str, config: SyntheticConfig) -> dict:
+    """
+    rootに合成したinput_combineフォルダを作成し、作成したファイル数とバイト数を返す
+    """
+    rng = random.Random(config.seed)
+    files = 0
+    total_bytes = 0
+    for subfolder_index in range(config.subfolders):
+        # 一部のフォルダは「履歴書」を含む名前にして分割なしの経路も通す
+        if subfolder_index < config.subfolders * config.resume_folder_ratio:
+            subfolder_name = f"履歴書_{subfolder_index:03d}"
+        else:
+            subfolder_name = f"部署_{subfolder_index:03d}"
+        subfolder_path = os.path.join(root, subfolder_name)
+        os.makedirs(subfolder_path, exist_ok=True)
+
+        index = 0
+        for row_chars in rows.values():
+            for _ in range(config.pdfs_per_row):
+                path = os.path.join(subfolder_path, _file_name(rng, row_chars, index, config.half_width_ratio))
+                _write_pdf(path, rng, config)
+                files += 1
+                total_bytes += os.path.getsize(path)
+                index += 1
+    return {'files': files, 'bytes': total_bytes}
@@ -0,0 +1,3 @@
+"""
+事務処理を支援するプログラム
+"""
@@ -0,0 +1,3 @@
+from hr_assist.cli import main
+
+main()
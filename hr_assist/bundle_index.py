@@ -0,0 +1,99 @@
+import os
+import json
+
+# 出力PDF(分割パーツ)の横に置く索引ファイルの接尾辞
+INDEX_SUFFIX = "_索引.json"
+
+
+def source_title(path: str) -> str:
+    """
+    しおりと索引に使う応募者名 (拡張子を除いたファイル名)
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def index_path(base_output_path: str) -> str:
+    """
+    {サブフォルダ}_{行}.pdf に対応する索引ファイルのパス
+    """
+    return os.path.splitext(base_output_path)[0] + INDEX_SUFFIX
+
+
+def part_toc(entries: list, page_start: int, page_end: int) -> list:
+    """
+    通しのページ番号 page_start〜page_end(排他) を1つのパートとしたときの目次 (set_toc の形式) を返す
+    entriesは [(ソースのパス, 通しの開始ページ, 通しの終了ページ(排他)), ...]
+    前のパートから続くソースは、そのパートの1ページ目にしおりを置く
+    """
+    return [
+        [1, source_title(path), max(start, page_start) - page_start + 1]
+        for path, start, end in entries
+        if start < page_end and end > page_start and end > start
+    ]
+
+
+def build_index(entries: list, parts: list) -> dict:
+    """
+    ソースごとの通しのページ範囲を、パートごとのページ範囲に変換した索引を作る
+    partsは [(出力ファイルのパス, ページ数, バイト数), ...]
+    ページ番号はすべて1始まりで終了ページを含む
+    """
+    offsets = []
+    offset = 0
+    for _, pages, _ in parts:
+        offsets.append(offset)
+        offset += pages
+
+    index_entries = []
+    for path, start, end in entries:
+        if end <= start:
+            continue
+        spans = []
+        for part_number, ((_, pages, _), part_start) in enumerate(zip(parts, offsets), 1):
+            span_start, span_end = max(start, part_start), min(end, part_start + pages)
+            if span_start < span_end:
+                spans.append({'part': part_number, 'start': span_start - part_start + 1, 'end': span_end - part_start})
+        index_entries.append({
+            'path': path,
+            'title': source_title(path),
+            'start': start + 1,
+            'end': end,
+            'spans': spans,
+        })
+
+    return {
+        'parts': [{'file': os.path.basename(path), 'pages': pages, 'bytes': size} for path, pages, size in parts],
+        'entries': index_entries,
+    }
+
+
+def write_index(path: str, index: dict):
+    """
+    索引を一時ファイル経由で書き出す
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+def load_index(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def index_records(index: dict, folder: str) -> list:
+    """
+    索引をログ出力用の辞書のリスト (応募者とパートの組ごとに1行) に変換する
+    """
+    return [
+        {
+            '応募者': entry['title'],
+            'ファイルパス': entry['path'],
+            '出力ファイル': os.path.join(folder, index['parts'][span['part'] - 1]['file']),
+            '開始ページ': span['start'],
+            '終了ページ': span['end'],
+        }
+        for entry in index['entries']
+        for span in entry['spans']
+    ]
@@ -0,0 +1,258 @@
+import os
+import csv
+import logging
+import unicodedata
+from functools import lru_cache
+from itertools import chain
+from collections import defaultdict
+
+from hr_assist.status_ledger import StatusLedger
+
+logger = logging.getLogger(__name__)
+
+# 50音のカタカナ行を定義
+rows = {
+    'ア行': 'アイウエオ',
+    'カ行': 'カキクケコ',
+    'サ行': 'サシスセソ',
+    'タ行': 'タチツテト',
+    'ナ行': 'ナニヌネノ',
+    'ハ行': 'ハヒフヘホ',
+    'マ行': 'マミムメモ',
+    'ヤ行': 'ヤユヨ',
+    'ラ行': 'ラリルレロ',
+    'ワ行': 'ワヲン'
+}
+
+# 小書きの仮名を通常の仮名に対応させる
+SMALL_KANA = str.maketrans('ァィゥェォッャュョヮヵヶ', 'アイウエオツヤユヨワカケ')
+
+# 長音符「ー」を直前の仮名の母音に置き換えるための対応表
+VOWELS = {
+    char: vowel
+    for vowel, chars in (
+        ('ア', 'アカサタナハマヤラワ'),
+        ('イ', 'イキシチニヒミリヰ'),
+        ('ウ', 'ウクスツヌフムユル'),
+        ('エ', 'エケセテネヘメレヱ'),
+        ('オ', 'オコソトノホモヨロヲ'),
+    )
+    for char in chars
+}
+
+# ローマ字で始まるファイル名の先頭文字から行を推定する (ヘボン式を想定)
+ROMAJI_ROWS = {
+    'a': 'ア行', 'i': 'ア行', 'u': 'ア行', 'e': 'ア行', 'o': 'ア行', 'v': 'ア行',
+    'k': 'カ行', 'g': 'カ行', 'q': 'カ行',
+    's': 'サ行', 'z': 'サ行', 'j': 'サ行',
+    't': 'タ行', 'd': 'タ行', 'c': 'タ行',
+    'n': 'ナ行',
+    'h': 'ハ行', 'b': 'ハ行', 'p': 'ハ行', 'f': 'ハ行',
+    'm': 'マ行',
+    'y': 'ヤ行',
+    'r': 'ラ行', 'l': 'ラ行',
+    'w': 'ワ行',
+}
+
+# ヘボン式のローマ字 -> カタカナ (並び順の読みに使う。長いものから照合する)
+ROMAJI_KANA = {
+    'kya': 'キャ', 'kyu': 'キュ', 'kyo': 'キョ', 'gya': 'ギャ', 'gyu': 'ギュ', 'gyo': 'ギョ',
+    'sha': 'シャ', 'shi': 'シ', 'shu': 'シュ', 'sho': 'ショ', 'she': 'シェ',
+    'cha': 'チャ', 'chi': 'チ', 'chu': 'チュ', 'cho': 'チョ', 'che': 'チェ', 'tsu': 'ツ',
+    'nya': 'ニャ', 'nyu': 'ニュ', 'nyo': 'ニョ', 'hya': 'ヒャ', 'hyu': 'ヒュ', 'hyo': 'ヒョ',
+    'bya': 'ビャ', 'byu': 'ビュ', 'byo': 'ビョ', 'pya': 'ピャ', 'pyu': 'ピュ', 'pyo': 'ピョ',
+    'mya': 'ミャ', 'myu': 'ミュ', 'myo': 'ミョ', 'rya': 'リャ', 'ryu': 'リュ', 'ryo': 'リョ',
+    'ja': 'ジャ', 'ji': 'ジ', 'ju': 'ジュ', 'jo': 'ジョ', 'je': 'ジェ',
+    'ka': 'カ', 'ki': 'キ', 'ku': 'ク', 'ke': 'ケ', 'ko': 'コ',
+    'ga': 'ガ', 'gi': 'ギ', 'gu': 'グ', 'ge': 'ゲ', 'go': 'ゴ',
+    'sa': 'サ', 'si': 'シ', 'su': 'ス', 'se': 'セ', 'so': 'ソ',
+    'za': 'ザ', 'zi': 'ジ', 'zu': 'ズ', 'ze': 'ゼ', 'zo': 'ゾ',
+    'ta': 'タ', 'ti': 'チ', 'tu': 'ツ', 'te': 'テ', 'to': 'ト',
+    'da': 'ダ', 'di': 'ヂ', 'du': 'ヅ', 'de': 'デ', 'do': 'ド',
+    'na': 'ナ', 'ni': 'ニ', 'nu': 'ヌ', 'ne': 'ネ', 'no': 'ノ',
+    'ha': 'ハ', 'hi': 'ヒ', 'hu': 'フ', 'fu': 'フ', 'he': 'ヘ', 'ho': 'ホ',
+    'fa': 'ファ', 'fi': 'フィ', 'fe': 'フェ', 'fo': 'フォ',
+    'ba': 'バ', 'bi': 'ビ', 'bu': 'ブ', 'be': 'ベ', 'bo': 'ボ',
+    'pa': 'パ', 'pi': 'ピ', 'pu': 'プ', 'pe': 'ペ', 'po': 'ポ',
+    'ma': 'マ', 'mi': 'ミ', 'mu': 'ム', 'me': 'メ', 'mo': 'モ',
+    'ya': 'ヤ', 'yu': 'ユ', 'yo': 'ヨ',
+    'ra': 'ラ', 'ri': 'リ', 'ru': 'ル', 're': 'レ', 'ro': 'ロ',
+    'wa': 'ワ', 'wo': 'ヲ', 'va': 'ヴァ', 'vi': 'ヴィ', 'vu': 'ヴ', 've': 'ヴェ', 'vo': 'ヴォ',
+    'a': 'ア', 'i': 'イ', 'u': 'ウ', 'e': 'エ', 'o': 'オ', 'n': 'ン',
+}
+
+
+def romaji_to_katakana(text: str) -> str:
+    """
+    ヘボン式のローマ字をカタカナの読みに変換する (変換できない文字はそのまま残す)
+    子音の重なり(kk, tch)は促音、母音の前にない n はンにする
+    """
+    text = unicodedata.normalize('NFKD', text.lower())  # 長音記号(ō等)を外す
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    result = []
+    position = 0
+    while position < len(text):
+        char = text[position]
+        following = text[position + 1:position + 2]
+        if char in "'-":  # 音節の区切り (shin'ichi 等)
+            position += 1
+            continue
+        if char.isalpha() and char not in 'aiueon' and (following == char or (char, following) == ('t', 'c')):
+            result.append('ッ')
+            position += 1
+            continue
+        for length in (3, 2, 1):
+            syllable = text[position:position + length]
+            # n の後に母音・y が続く場合は ナ行 (na, nya) として読む
+            if syllable == 'n' and text[position + 1:position + 2] in tuple('aiueoy'):
+                continue
+            if syllable in ROMAJI_KANA:
+                result.append(ROMAJI_KANA[syllable])
+                position += length
+                break
+        else:
+            result.append(char)
+            position += 1
+    return ''.join(result)
+
+
+def _base_katakana(char: str) -> str:
+    """
+    仮名1文字を全角・清音・通常サイズのカタカナにそろえる
+    """
+    char = unicodedata.normalize('NFKC', char)  # 半角カタカナを全角に
+    if 'ぁ' <= char <= 'ゖ':
+        char = chr(ord(char) + 0x60)  # ひらがなをカタカナに
+    char = unicodedata.normalize('NFD', char)[0]  # 濁点・半濁点を外す
+    return char.translate(SMALL_KANA)
+
+
+def _build_row_index() -> dict:
+    """
+    ひらがな・カタカナ・半角カタカナの各コードポイントから行への対応表を作る
+    """
+    index = {}
+    kana = chain(range(0x3041, 0x3097), range(0x30A1, 0x30FB), range(0xFF66, 0xFF9E))
+    for code_point in kana:
+        base = _base_katakana(chr(code_point))
+        if base in 'ヰヱ':
+            index[chr(code_point)] = 'ワ行'
+            continue
+        for row, chars in rows.items():
+            if base in chars:
+                index[chr(code_point)] = row
+                break
+    return index
+
+
+# ファイル名の先頭文字 -> 行 (分類は1ファイルにつき1回の辞書引きで済む)
+ROW_INDEX = _build_row_index()
+
+
+@lru_cache(maxsize=None)
+def collation_key(name: str) -> tuple:
+    """
+    50音順(辞書順)の照合キー。ファイル名ごとに1度だけ計算してキャッシュする
+    第1キー: ひらがな・半角・小書き・濁点の違いをそろえたカタカナの読み (長音符は直前の母音に置き換える)
+    第2キー: 清音 < 濁音 < 半濁音
+    第3キー: 小書き < 通常、ひらがな < カタカナ < 長音符
+    """
+    primary = []
+    secondary = []
+    tertiary = []
+    for char in unicodedata.normalize('NFKC', name):  # 半角カタカナと半角の濁点はここで結合される
+        if char == 'ー' and primary:
+            primary.append(VOWELS.get(primary[-1], primary[-1]))
+            secondary.append(0)
+            tertiary.append((1, 2))  # 同じ読みなら母音の仮名 < 長音符
+            continue
+
+        hiragana = 'ぁ' <= char <= 'ゖ'
+        if hiragana:
+            char = chr(ord(char) + 0x60)
+        decomposed = unicodedata.normalize('NFD', char)
+        voicing = 1 if '\u3099' in decomposed else 2 if '\u309a' in decomposed else 0
+        base = decomposed[0]
+        large = base.translate(SMALL_KANA)
+
+        primary.append(large.casefold())
+        secondary.append(voicing)
+        tertiary.append((0 if large != base else 1, 0 if hiragana else 1))
+    return ''.join(primary), tuple(secondary), tuple(tertiary)
+
+
+def load_readings(csv_path: str) -> dict:
+    """
+    フリガナの対応表 (列: ファイル名, フリガナ) を読み込む
+    漢字や英字で始まるファイル名をフリガナの先頭文字で分類するために使う
+    """
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        return {record['ファイル名']: record['フリガナ'] for record in csv.DictReader(f) if record.get('フリガナ')}
+
+
+def resolve_row(file_name: str, readings=None, romaji=False):
+    """
+    ファイル名から行を求める。分類できなければNoneを返す
+    仮名で始まらない場合は、フリガナの対応表 (拡張子あり・なしのファイル名) とローマ字の順に試す
+    """
+    row = ROW_INDEX.get(collation_key(os.path.splitext(file_name)[0])[0][:1])
+    if row is None and readings:
+        reading = readings.get(file_name) or readings.get(os.path.splitext(file_name)[0])
+        if reading:
+            row = ROW_INDEX.get(reading[0])
+    if row is None and romaji:
+        row = ROMAJI_ROWS.get(unicodedata.normalize('NFKC', file_name[0]).lower())
+    return row
+
+
+def clean_filename(filename: str) -> str:
+    """
+    Windowsで使用できない文字を置き換える
+    """
+    invalid_chars = r'<>:"/\|?*'
+    for char in invalid_chars:
+        filename = filename.replace(char, "_")
+    return filename
+
+
+def classify_files(file_paths: list, ledger: StatusLedger, readings=None, romaji=False) -> dict:
+    """
+    PDFのパスをファイル名で行ごとに分類し、各ファイルの状態をledgerに登録する
+    readings/romajiはresolve_rowに渡す (漢字・英字で始まるファイル名の分類用)
+    戻り値は行ごとのファイルリスト
+    """
+    file_groups = defaultdict(list)
+
+    for file_path in file_paths:
+        file_name = os.path.basename(file_path)
+        logger.debug("処理中のファイル: %s", file_name)
+        status_record = ledger.add(file_path)
+
+        row = resolve_row(file_name, readings, romaji)
+        if row is not None:
+            file_groups[row].append(file_path)
+            status_record.state = '結合予定'
+            status_record.row = row
+            logger.debug("%s は %s に分類されました", file_name, row)
+        else:
+            logger.debug("%s は 50音順に対応しません", file_name)
+
+    return file_groups
+
+
+def sort_key(file_path: str, readings=None, romaji=False) -> tuple:
+    """
+    行内の並び順に使うキー (拡張子を除いたファイル名の50音順の照合キー)
+    仮名で始まらないファイル名は、分類(resolve_row)と同じくフリガナ、ローマ字の読みの順で並べる
+    同じ読みのファイルはファイル名の照合キーで並べる
+    """
+    file_name = os.path.basename(file_path)
+    name = os.path.splitext(file_name)[0]
+    reading = name
+    if ROW_INDEX.get(collation_key(name)[0][:1]) is None:
+        furigana = readings and (readings.get(file_name) or readings.get(name))
+        if furigana:
+            reading = furigana
+        elif romaji and ROMAJI_ROWS.get(unicodedata.normalize('NFKC', name[:1]).lower()):
+            reading = romaji_to_katakana(unicodedata.normalize('NFKC', name))
+    return collation_key(reading), collation_key(name)
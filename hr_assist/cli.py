@@ -0,0 +1,131 @@
+import argparse
+from datetime import datetime
+
+from hr_assist.log_writers import LOG_WRITERS
+
+# 各サブコマンドの実装モジュール (PyMuPDF等の重い依存は実行時まで読み込まない)
+COMMANDS = {
+    'combine': 'hr_assist.combine',
+    'resize': 'hr_assist.resize',
+    'rebuild': 'hr_assist.rebuild',
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='hr_assist', description="事務処理を支援するプログラム")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # 全サブコマンド共通のオプション
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--input', default='./input_combine',
+                        help="入力フォルダのパス (既定: ./input_combine)")
+    common.add_argument('--output', default=f"./{datetime.now().strftime('%Y%m%d')}_output",
+                        help="出力フォルダのパス (既定: ./{日付}_output)")
+    common.add_argument('--log-format', choices=sorted(LOG_WRITERS), default='xlsx',
+                        help="ログファイルの形式 (csv/jsonlは処理中に逐次書き出す)")
+    common.add_argument('--furigana', metavar='CSV',
+                        help="漢字・英字で始まるファイル名を分類するためのフリガナ表 (列: ファイル名, フリガナ)")
+    common.add_argument('--romaji', action='store_true',
+                        help="英字で始まるファイル名をローマ字読みとして分類する")
+    common.add_argument('--depth', type=int, default=1,
+                        help="サブフォルダから何階層下までPDFを探すか (既定: 1 = サブフォルダ直下のみ)")
+    common.add_argument('--profile', action='store_true',
+                        help="cProfileで計測し、出力フォルダに profile.pstats を書き出す (ワーカープロセス内は対象外)")
+    common.add_argument('-v', '--verbose', action='count', default=0,
+                        help="ファイルごとの処理状況も表示する (既定ではグループ単位の進捗のみ)")
+    common.add_argument('-q', '--quiet', action='store_true',
+                        help="警告とエラーのみ表示し、進捗バーも出さない")
+
+    combine = subparsers.add_parser('combine', parents=[common],
+                                    help="PDFを50音の行ごとに結合し、9MBごとに分割する")
+    combine.add_argument('--workers', type=int, default=1,
+                         help="(サブフォルダ, 行)グループを並列処理するプロセス数 (1なら逐次処理)")
+    combine.add_argument('--memory-mb', type=float, default=4096,
+                         help="並列処理時に同時に結合するグループの見積もりメモリの上限(MB)。0なら無制限 (既定: 4096)")
+    combine.add_argument('--full', action='store_true',
+                         help="マニフェストを無視してすべてのグループを結合し直す (事前検査とOCRのキャッシュは使う)")
+    combine.add_argument('--resume', action='store_true',
+                         help="中断した実行を同じ出力フォルダで再開する (完了済みのグループはジャーナルから復元する)")
+    combine.add_argument('--dry-run', action='store_true',
+                         help="分類と結合予定の表示だけを行い、PDFは作成しない")
+    combine.add_argument('--prefetch-mb', type=float, default=64,
+                         help="結合中に先読みしておく入力PDFの合計サイズの上限(MB) (既定: 64)")
+    combine.add_argument('--prefetch-threads', type=int, default=4,
+                         help="入力PDFとフォルダ一覧を先読みするスレッド数。0なら先読みしない (既定: 4)")
+    combine.add_argument('--preflight-timeout', type=float, default=60,
+                         help="事前検査で1ファイルに掛ける時間の上限(秒)。超えたファイルは隔離する (既定: 60)")
+    combine.add_argument('--skip-preflight', action='store_true',
+                         help="結合前の事前検査(破損・暗号化の検出と修復・隔離)を行わない")
+    combine.add_argument('--compress', action='store_true',
+                         help="9MBを超えるグループは分割の前に画像を再圧縮する (ページごとのサイズ変化をCSVに出力)")
+    combine.add_argument('--compress-dpi', type=int, default=150,
+                         help="再圧縮の目標解像度。これより高解像度の画像を縮小する (既定: 150)")
+    combine.add_argument('--jpeg-quality', type=int, default=75,
+                         help="再圧縮時のJPEG品質 (既定: 75)")
+    combine.add_argument('--compress-workers', type=int, default=1,
+                         help="画像の再エンコードを並列に行うプロセス数 (既定: 1)")
+    combine.add_argument('--ocr', action='store_true',
+                         help="テキストのないスキャンページをTesseractでOCRし、透明なテキストレイヤーを重ねる (検索できるようにする)")
+    combine.add_argument('--ocr-lang', default='jpn',
+                         help="Tesseractの言語 (既定: jpn。複数なら jpn+eng のように指定する)")
+    combine.add_argument('--ocr-dpi', type=int, default=300,
+                         help="OCRのためにページを描画する解像度 (既定: 300)")
+    combine.add_argument('--ocr-workers', type=int, default=1,
+                         help="同時に起動するTesseractのプロセス数 (既定: 1)")
+    combine.add_argument('--tesseract', default='tesseract',
+                         help="Tesseractの実行ファイル (既定: PATH上の tesseract)")
+
+    resize = subparsers.add_parser('resize', parents=[common],
+                                   help="PDFを行ごとに結合しながらA4サイズに統一する")
+    resize.add_argument('--rasterize-fallback', action='store_true',
+                        help="A4への配置に失敗したページのみ画像化して出力する")
+    resize.add_argument('--keep-original', action='store_true',
+                        help="A4変換前の結合PDFも出力する")
+
+    rebuild = subparsers.add_parser('rebuild', parents=[common],
+                                    help="結合済みのPDFから1人分のページを取り出し・差し替え・削除・追加する")
+    rebuild.add_argument('bundle',
+                         help="対象の結合済みPDF ({出力フォルダ}/{サブフォルダ}/{サブフォルダ}_{行}.pdf。分割済みでも番号なしで指定する)")
+    action = rebuild.add_mutually_exclusive_group(required=True)
+    action.add_argument('--extract', metavar='応募者',
+                        help="応募者(拡張子なしのファイル名)のページを取り出して --to に保存する")
+    action.add_argument('--replace', metavar='応募者',
+                        help="応募者のページを --source のPDFに差し替える")
+    action.add_argument('--delete', metavar='応募者',
+                        help="応募者のページを削除する")
+    action.add_argument('--insert', metavar='PDF',
+                        help="PDFを50音順の位置に追加する")
+    rebuild.add_argument('--source', metavar='PDF',
+                         help="--replace で差し替えるPDF")
+    rebuild.add_argument('--to', metavar='PDF',
+                         help="--extract の保存先 (既定: ./{応募者}.pdf)")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    import importlib
+    import logging
+    from hr_assist.console import setup_logging
+
+    setup_logging(-1 if args.quiet else args.verbose)
+
+    command = importlib.import_module(COMMANDS[args.command])
+    if not args.profile:
+        command.run(args)
+        return
+
+    import os
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(command.run, args)
+    finally:
+        os.makedirs(args.output, exist_ok=True)
+        profile_path = os.path.join(args.output, 'profile.pstats')
+        profiler.dump_stats(profile_path)
+        logging.getLogger(__name__).info("プロファイル結果を %s に出力しました (python -m pstats %s で確認できます)",
+                                         profile_path, profile_path)
@@ -0,0 +1,285 @@
+import os
+import logging
+from itertools import chain
+
+from hr_assist.bundle_index import INDEX_SUFFIX, index_records, load_index
+from hr_assist.classify import classify_files, clean_filename, load_readings
+from hr_assist.journal import Journal, load_journal, remove_partial_files
+from hr_assist.log_writers import open_log_writer
+from hr_assist.manifest import (
+    file_signature,
+    find_previous_manifest,
+    has_errors,
+    outputs_present,
+    remove_stale_outputs,
+    reuse_group_outputs,
+    same_contents,
+    save_manifest,
+)
+from hr_assist.prefetch import PrefetchOptions
+from hr_assist.profiling import StageTimer, timing_report
+from hr_assist.scan import group_by_subfolder, scan_input
+from hr_assist.status_ledger import FileStatus, StatusLedger
+
+logger = logging.getLogger(__name__)
+
+
+def options_fingerprint(args) -> dict:
+    """
+    出力PDFの内容を変えるオプションの組 (マニフェストとジャーナルの記録に残し、一致する場合だけ前回の出力を使う)
+    """
+    return {
+        'compress': [args.compress_dpi, args.jpeg_quality] if args.compress else None,
+        'preflight': not args.skip_preflight,
+        'ocr': [args.ocr_lang, args.ocr_dpi] if args.ocr else None,
+    }
+
+
+def run(args):
+    """
+    combineサブコマンド: 入力フォルダ内のPDFを50音の行ごとに結合する
+    """
+    input_folder_path = args.input
+    output_folder_path = args.output
+    output_folder_name = os.path.basename(os.path.normpath(output_folder_path))
+
+    logger.info("入力フォルダ: %s", input_folder_path)
+    logger.info("出力フォルダ: %s", output_folder_path)
+
+    readings = load_readings(args.furigana) if args.furigana else None
+    ledger = StatusLedger()
+    jobs = []
+    # 段階ごとの計測: (サブフォルダ, 行)単位と実行全体。行が空のものはサブフォルダ単位の段階(分類)
+    group_timers = {}
+    run_timer = StageTimer()
+
+    # --full でも前回の出力フォルダは事前検査とOCRのキャッシュに使い、グループの再利用だけを行わない
+    previous_manifest, previous_folder = find_previous_manifest(output_folder_path)
+    previous_groups = {} if args.full else previous_manifest['groups']
+    # --resume: 中断した実行のジャーナルから完了済みのグループを読み込む (ログもここから作り直す)
+    completed_groups = load_journal(output_folder_path) if args.resume else {}
+    previous_files = {
+        record['path']: record
+        for entry in chain(previous_groups.values(), completed_groups.values())
+        for record in entry['files']
+    }
+    manifest = {'groups': {}}
+    fingerprint = options_fingerprint(args)
+    # 分類と再利用の判定ではファイルに触れず、ドライランでなければ後でまとめて反映する
+    log_rows = []  # ログに書く行 (分類できなかったファイルと再利用するグループ)
+    reused = []  # (再利用する記録, その出力のあるフォルダ)
+    stale = []  # (結合し直すグループの前回の記録, そのフォルダ)
+
+    prefetch = PrefetchOptions(max_bytes=int(args.prefetch_mb * 1024 * 1024), threads=args.prefetch_threads)
+
+    # 入力フォルダを1度だけ走査し、サイズと更新日時つきの作業リストを作る
+    with run_timer.measure('走査'):
+        scanned = scan_input(input_folder_path, args.depth, prefetch.threads)
+    stats = {scanned_file.path: scanned_file for scanned_file in scanned}
+    subfolders = group_by_subfolder(scanned)
+    logger.info("サブフォルダの数: %d (PDF %d件)", len(subfolders), len(scanned))
+
+    logger.info("ファイルを分類中...")
+    for subfolder_name, subfolder_files in subfolders.items():
+        logger.debug("現在処理中のサブフォルダ: %s", subfolder_name)
+        sub_output_folder_path = os.path.join(output_folder_path, clean_filename(subfolder_name))
+
+        subfolder_ledger = StatusLedger()
+        classify_timer = group_timers.setdefault((subfolder_name, ''), StageTimer())
+        with classify_timer.measure('分類'):
+            file_groups = classify_files([f.path for f in subfolder_files], subfolder_ledger, readings, args.romaji)
+        ledger.extend(subfolder_ledger)
+        log_rows.append([status.to_record() for status in subfolder_ledger if status.row == 'なし'])
+        for row, files in file_groups.items():
+            if not files:
+                continue
+            group_key = f"{subfolder_name}/{row}"
+            signatures = [
+                file_signature(path, previous_files, stats[path].size, stats[path].mtime)
+                for path in sorted(files)
+            ]
+            entry = previous_groups.get(group_key)
+            source_folder = previous_folder
+            if group_key in completed_groups:
+                entry, source_folder = completed_groups[group_key], output_folder_path
+
+            # 前回(または中断前)から入力の内容も出力に関わるオプションも変わっておらず、
+            # エラーのファイルもないグループは結合せず、その出力を使う (記録する更新日時は今回のものにする)
+            if (entry and same_contents(entry['files'], signatures) and entry.get('options') == fingerprint
+                    and not has_errors(entry) and outputs_present(entry, source_folder)):
+                logger.info("%s は前回から変更がないためスキップしました", group_key)
+                entry = {**entry, 'files': signatures}
+                manifest['groups'][group_key] = entry
+                ledger.apply(FileStatus.from_record(record) for record in entry['statuses'])
+                log_rows.append(entry['statuses'])
+                reused.append((entry, source_folder))
+                continue
+
+            if entry:
+                stale.append((entry, source_folder))
+            elif group_key in previous_manifest['groups']:
+                # --full: 同じ出力フォルダの前回のパーツは削除する
+                stale.append((previous_manifest['groups'][group_key], previous_folder))
+            jobs.append((subfolder_name, row, files, sub_output_folder_path))
+            manifest['groups'][group_key] = {'files': signatures, 'options': fingerprint}
+
+    if args.dry_run:
+        for subfolder_name, row, files, _ in jobs:
+            logger.info("結合予定: %s/%s (%dファイル)", subfolder_name, row, len(files))
+        logger.info("%dグループを結合予定です (ドライラン)", len(jobs))
+        return
+
+    # ここから出力フォルダを書き換える
+    os.makedirs(output_folder_path, exist_ok=True)
+    for subfolder_name in subfolders:
+        os.makedirs(os.path.join(output_folder_path, clean_filename(subfolder_name)), exist_ok=True)
+    removed = remove_partial_files(output_folder_path)
+    if removed:
+        logger.info("前回の中断で残った一時ファイルを%d件削除しました", removed)
+    for entry, source_folder in reused:
+        reuse_group_outputs(entry, source_folder, output_folder_path)
+    for entry, source_folder in stale:
+        remove_stale_outputs(entry, source_folder, output_folder_path)
+    if previous_folder is not None:
+        from hr_assist.ocr import carry_cache
+
+        carry_cache(previous_folder, output_folder_path)
+
+    log_writer = open_log_writer(args.log_format, output_folder_path, clean_filename(f"{output_folder_name}ログ"))
+    with run_timer.measure('ログ出力'):
+        for rows in log_rows:
+            log_writer.write_rows(rows)
+
+    # PyMuPDFやtqdmの読み込みは実際に結合するときまで遅らせる
+    from concurrent.futures import ProcessPoolExecutor
+    from tqdm import tqdm
+    from hr_assist.console import worker_logging, worker_progress
+    from hr_assist.merge import merge_group
+    from hr_assist.schedule import PAGE_WORK_BYTES, schedule_jobs
+
+    compress = None
+    if args.compress:
+        from hr_assist.compress import CompressOptions
+        compress = CompressOptions(dpi=args.compress_dpi, quality=args.jpeg_quality, workers=args.compress_workers)
+
+    ocr = None
+    if args.ocr:
+        from hr_assist.ocr import CACHE_FOLDER_NAME, OcrOptions, check_tesseract
+        check_tesseract(args.tesseract)
+        # OCR結果は今回の出力フォルダにキャッシュし、前回の出力フォルダのキャッシュも使う
+        cache_folders = [os.path.join(folder, CACHE_FOLDER_NAME) for folder in (output_folder_path, previous_folder) if folder]
+        ocr = OcrOptions(language=args.ocr_lang, dpi=args.ocr_dpi, workers=args.ocr_workers,
+                         command=args.tesseract, cache_folders=tuple(cache_folders))
+
+    def group_sizes(job):
+        # 走査で得たサイズを先読みの上限計算に使う
+        return {path: stats[path].size for path in job[2]}
+
+    def group_bytes(job):
+        return sum(stats[path].size for path in job[2])
+
+    # 結合を始める前に全ファイルを並列に検査し、壊れたファイルは修復または隔離しておく
+    preflight = {}
+    if not args.skip_preflight:
+        from hr_assist.preflight import QUARANTINE, REPAIR, run_preflight
+
+        hashes = {
+            record['path']: record['sha256']
+            for subfolder_name, row, _, _ in jobs
+            for record in manifest['groups'][f"{subfolder_name}/{row}"]['files']
+        }
+        logger.info("PDFを事前検査中...")
+        with run_timer.measure('事前検査', bytes_in=sum(stats[path].size for path in hashes)):
+            preflight, cached = run_preflight(hashes, output_folder_path, previous_folder, args.workers, args.preflight_timeout)
+        states = [result.state for result in preflight.values()]
+        logger.info("事前検査: %d件 (キャッシュ %d件, 修復 %d件, 隔離 %d件)",
+                    len(preflight), cached, states.count(REPAIR), states.count(QUARANTINE))
+        preflight_records = [result.to_record(path) for path, result in preflight.items()]
+        preflight_writer = open_log_writer(args.log_format, output_folder_path, clean_filename(f"{output_folder_name}事前検査"))
+        preflight_writer.write_rows(preflight_records)
+        preflight_writer.close(preflight_records)
+
+    def group_preflight(job):
+        return {path: preflight[path] for path in job[2] if path in preflight}
+
+    def group_cost(job):
+        # 投入順は入力バイト数とページ数(事前検査で判明したもの)から見積もる
+        pages = sum(preflight[path].pages for path in job[2] if path in preflight)
+        return group_bytes(job) + pages * PAGE_WORK_BYTES
+
+    journal = Journal(output_folder_path, resume=args.resume)
+
+    def finish_group(job, group_statuses, output_paths, timer):
+        # ワーカーから返った状態と計測を台帳に反映 (台帳の並びは分類時の順序のまま)
+        subfolder_name, row, _, _ = job
+        merged = sum(status.state == '結合済' for status in group_statuses)
+        logger.info("%s/%s: %d/%dファイルを結合 (%dページ) → %d件出力", subfolder_name, row, merged,
+                    len(group_statuses), sum(status.pages for status in group_statuses),
+                    sum(not path.endswith(INDEX_SUFFIX) for path in output_paths))
+        ledger.apply(group_statuses)
+        group_timers[(subfolder_name, row)] = timer
+        entry = manifest['groups'][f"{subfolder_name}/{row}"]
+        entry['outputs'] = [os.path.relpath(path, output_folder_path) for path in output_paths]
+        entry['statuses'] = [status.to_record() for status in group_statuses]
+        # エラーのファイルを含むグループは完了扱いにせず、再開時に結合し直す
+        if not has_errors(entry):
+            journal.record(f"{subfolder_name}/{row}", entry)
+        with run_timer.measure('ログ出力'):
+            log_writer.write_rows(entry['statuses'])
+
+    logger.info("PDFを結合中...")
+    # 進捗はファイルごとに入力バイト数で進める (ファイルごとのログは -v のときだけ出す)
+    progress = tqdm(total=sum(group_bytes(job) for job in jobs), unit='B', unit_scale=True, unit_divisor=1024,
+                    disable=not logger.isEnabledFor(logging.INFO))
+    if args.workers > 1:
+        # グループごとに独立しているため、プロセスプールに投げて結果の状態レコードだけを受け取る
+        # グループの大きさの偏りが大きいため、入力バイト数の大きい順に投入し、メモリ予算の範囲で同時実行する
+        # ワーカーのログと進捗は親プロセスのキューに送って出力する
+        initializer, initargs = worker_logging()
+        with worker_progress(progress) as report_progress, \
+                ProcessPoolExecutor(max_workers=args.workers, initializer=initializer, initargs=initargs) as executor:
+            def submit(job):
+                return executor.submit(merge_group, *job, compress=compress, prefetch=prefetch, ocr=ocr,
+                                       sizes=group_sizes(job), preflight=group_preflight(job),
+                                       progress=report_progress, readings=readings, romaji=args.romaji)
+
+            memory_budget = int(args.memory_mb * 1024 * 1024)
+            scheduled = schedule_jobs(jobs, group_cost, submit, args.workers, memory_budget, memory=group_bytes)
+            for job, future in scheduled:
+                finish_group(job, *future.result())
+    else:
+        for job in jobs:
+            finish_group(job, *merge_group(*job, compress=compress, prefetch=prefetch, ocr=ocr,
+                                           sizes=group_sizes(job), preflight=group_preflight(job),
+                                           progress=progress.update, readings=readings, romaji=args.romaji))
+
+    progress.close()
+    journal.close()
+    save_manifest(manifest, output_folder_path)
+
+    logger.info("ファイルの結合と整理が完了しました。")
+
+    with run_timer.measure('ログ出力'):
+        log_writer.close(ledger.to_records())
+    logger.info("ログファイルが %s に%s形式で出力されました。", log_writer.path, log_writer.label)
+
+    # グループごとの索引(スキップしたグループは前回の索引)をまとめ、応募者 -> 出力ファイルとページ範囲の一覧を出力する
+    with run_timer.measure('ログ出力'):
+        index_records_all = [
+            record
+            for entry in manifest['groups'].values()
+            for path in entry.get('outputs', [])
+            if path.endswith(INDEX_SUFFIX)
+            for record in index_records(load_index(os.path.join(output_folder_path, path)), os.path.dirname(path))
+        ]
+        index_writer = open_log_writer(args.log_format, output_folder_path, clean_filename(f"{output_folder_name}索引"))
+        index_writer.write_rows(index_records_all)
+        index_writer.close(index_records_all)
+    logger.info("応募者ごとの出力ファイルとページ範囲が %s に出力されました。", index_writer.path)
+
+    # 段階ごとの処理時間を行・サブフォルダ・全体で集計して別のログに出力する
+    timing_writer = open_log_writer(args.log_format, output_folder_path, clean_filename(f"{output_folder_name}タイミング"))
+    timing_records = timing_report(group_timers, run_timer)
+    timing_writer.write_rows(timing_records)
+    timing_writer.close(timing_records)
+    logger.info("段階ごとの処理時間が %s に出力されました。", timing_writer.path)
@@ -0,0 +1,133 @@
+import os
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+
+from hr_assist.log_writers import open_log_writer
+from hr_assist.split import estimate_page_costs
+
+
+@dataclass
+class CompressOptions:
+    """
+    画像の再圧縮の設定
+    """
+    dpi: int = 150
+    quality: int = 75
+    min_bytes: int = 64 * 1024  # これより小さい画像は対象外
+    workers: int = 1
+
+
+def _recompress(task: tuple):
+    """
+    1画像をダウンサンプリングしてJPEGに再エンコードする (ワーカープロセスでも実行される)
+    戻り値は (xref, JPEGのバイト列, 幅, 高さ, 色空間名)。元のストリームより小さくならない場合はバイト列がNone
+    """
+    xref, image_bytes, raw_size, scale, quality = task
+    pix = fitz.Pixmap(image_bytes)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if scale < 1:
+        pix = fitz.Pixmap(pix, max(1, int(pix.width * scale)), max(1, int(pix.height * scale)), None)
+    new_bytes = pix.tobytes('jpeg', jpg_quality=quality)
+    colorspace = '/DeviceGray' if pix.colorspace.n == 1 else '/DeviceRGB'
+    return xref, new_bytes if len(new_bytes) < raw_size else None, pix.width, pix.height, colorspace
+
+
+def _is_replaceable(doc, xref: int, smask: int) -> bool:
+    """
+    差し替えても見た目が変わらない画像か (透過マスク・ステンシルマスクを持つ画像は対象外)
+    """
+    if smask:
+        return False
+    if doc.xref_get_key(xref, 'Mask')[0] != 'null':
+        return False
+    return doc.xref_get_key(xref, 'ImageMask')[1] != 'true'
+
+
+def compress_images(doc, options: CompressOptions, executor=None) -> int:
+    """
+    ドキュメント内の大きな画像を目標解像度・JPEG品質で再圧縮する
+    executor (ProcessPoolExecutor) を渡すと画像ごとの再エンコードを並列に行う
+    差し替えは本体側で画像オブジェクトのストリームと辞書を直接書き換える (参照しているページはそのまま)
+    戻り値は差し替えた画像の数
+    """
+    # 1回の走査で、画像ごとの実効解像度を集める
+    # 同じ画像が複数のページ・箇所に置かれている場合は、最も大きく表示される箇所 (解像度が最も低い箇所) に合わせる
+    dpi_of = {}  # 配置が見つからない画像はNone
+    skipped = set()
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, smask, width = img[0], img[1], img[2]
+            if xref in skipped:
+                continue
+            if xref not in dpi_of:
+                if not _is_replaceable(doc, xref, smask):
+                    skipped.add(xref)
+                    continue
+                dpi_of[xref] = None
+            for rect in page.get_image_rects(xref):
+                if rect.width > 0:
+                    dpi = width / (rect.width / 72)
+                    dpi_of[xref] = dpi if dpi_of[xref] is None else min(dpi_of[xref], dpi)
+
+    tasks = []
+    for xref, dpi in dpi_of.items():
+        raw_size = len(doc.xref_stream_raw(xref) or b'')
+        if raw_size < options.min_bytes:
+            continue
+        scale = options.dpi / dpi if dpi is not None and dpi > options.dpi else 1.0
+        tasks.append((xref, doc.extract_image(xref)['image'], raw_size, scale, options.quality))
+
+    if executor is not None and len(tasks) > 1:
+        results = list(executor.map(_recompress, tasks))
+    else:
+        results = [_recompress(task) for task in tasks]
+
+    replaced = 0
+    for xref, new_bytes, width, height, colorspace in results:
+        if new_bytes is None:
+            continue
+        doc.update_stream(xref, new_bytes, compress=False)
+        doc.xref_set_key(xref, 'Filter', '/DCTDecode')
+        doc.xref_set_key(xref, 'DecodeParms', 'null')
+        doc.xref_set_key(xref, 'Decode', 'null')
+        doc.xref_set_key(xref, 'Width', str(width))
+        doc.xref_set_key(xref, 'Height', str(height))
+        doc.xref_set_key(xref, 'BitsPerComponent', '8')
+        doc.xref_set_key(xref, 'ColorSpace', colorspace)
+        replaced += 1
+    return replaced
+
+
+def compress_document(doc, options: CompressOptions, timer, executor=None) -> tuple:
+    """
+    結合前のソースPDFの画像を再圧縮する (分割の見積もりが再圧縮後のサイズで行われ、パート数が減る)
+    戻り値は (再圧縮後のestimate_page_costsの結果, ページごとの(再圧縮前, 再圧縮後)のバイト数)
+    """
+    with timer.measure('画像再圧縮') as measurement:
+        before = estimate_page_costs(doc)
+        compress_images(doc, options, executor)
+        after = estimate_page_costs(doc)
+        page_sizes = [
+            (own_before + sum(shared_before.values()), own_after + sum(shared_after.values()))
+            for (own_before, shared_before), (own_after, shared_after) in zip(before, after)
+        ]
+        measurement.bytes_in = sum(page_before for page_before, _ in page_sizes)
+        measurement.bytes_out = sum(page_after for _, page_after in page_sizes)
+    return after, page_sizes
+
+
+def write_compress_report(report_path: str, page_sizes: list):
+    """
+    グループ内のページごとのサイズ変化をreport_path(拡張子なし)のCSVに出力する
+    """
+    records = [
+        {'ページ': page_num, '再圧縮前(バイト)': page_before, '再圧縮後(バイト)': page_after}
+        for page_num, (page_before, page_after) in enumerate(page_sizes, 1)
+    ]
+    report_writer = open_log_writer('csv', os.path.dirname(report_path), os.path.basename(report_path))
+    report_writer.write_rows(records)
+    report_writer.close(records)
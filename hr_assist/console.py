@@ -0,0 +1,107 @@
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextlib import contextmanager
+
+LOGGER_NAME = 'hr_assist'
+
+# -q: 警告とエラーのみ / 既定: グループ単位の進捗 / -v: ファイル単位の詳細
+LEVELS = {-1: logging.WARNING, 0: logging.INFO, 1: logging.DEBUG}
+
+_handlers = []
+_listeners = []
+
+
+class TqdmHandler(logging.StreamHandler):
+    """
+    進捗バーを崩さないよう tqdm.write で出力するハンドラ
+    進捗バーを表示するまでtqdmは読み込まれないため、それまでは (ドライラン等) ストリームに直接書く
+    """
+
+    def emit(self, record):
+        try:
+            tqdm_module = sys.modules.get('tqdm')
+            if tqdm_module is None:
+                self.stream.write(self.format(record) + self.terminator)
+                self.flush()
+            else:
+                tqdm_module.tqdm.write(self.format(record), file=self.stream)
+        except Exception:
+            self.handleError(record)
+
+
+def _start_listener(log_queue):
+    listener = logging.handlers.QueueListener(log_queue, *_handlers)
+    listener.start()
+    _listeners.append(listener)
+
+
+def _use_queue(log_queue, level: int):
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def setup_logging(verbosity: int = 0):
+    """
+    hr_assistのロガーを設定する
+    処理側はキューに積むだけで、コンソールへの書き込みは別スレッドのリスナーが行う
+    """
+    handler = TqdmHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _handlers[:] = [handler]
+    log_queue = queue.SimpleQueue()
+    _use_queue(log_queue, LEVELS[max(-1, min(verbosity, 1))])
+    _start_listener(log_queue)
+    atexit.register(stop_logging)
+
+
+def worker_logging():
+    """
+    ProcessPoolExecutorに渡す (initializer, initargs) を返す
+    ワーカープロセスのログはプロセス間のキューで親に送り、親のリスナーが出力する
+    """
+    import multiprocessing
+
+    log_queue = multiprocessing.Queue()
+    _start_listener(log_queue)
+    return _use_queue, (log_queue, logging.getLogger(LOGGER_NAME).level)
+
+
+@contextmanager
+def worker_progress(progress):
+    """
+    ワーカープロセスからファイルごとの進捗(入力バイト数)を受け取り、親の進捗バーを進める
+    ワーカーには yield したキューの put を渡す (Managerのキューはsubmitの引数として送れる)
+    """
+    import threading
+    import multiprocessing
+
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+
+        def receive():
+            while True:
+                nbytes = progress_queue.get()
+                if nbytes is None:
+                    return
+                progress.update(nbytes)
+
+        thread = threading.Thread(target=receive, daemon=True)
+        thread.start()
+        try:
+            yield progress_queue.put
+        finally:
+            progress_queue.put(None)
+            thread.join()
+
+
+def stop_logging():
+    """
+    キューに残ったログを出力し切ってリスナーを止める
+    """
+    while _listeners:
+        _listeners.pop().stop()
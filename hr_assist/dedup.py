@@ -0,0 +1,142 @@
+import re
+import hashlib
+
+# 間接参照 "12 0 R"
+_REFERENCE = re.compile(r'\b(\d+) 0 R\b')
+# 同じ内容でも値が揺れうるため比較から外すキー
+_LENGTH = re.compile(r'/Length\s+(\d+)\b(?!\s+\d+\s+R)')
+# Flate圧縮は作成したツールで圧縮率が違うと、展開後の内容が同じでもバイト列が揺れる
+_FILTER = re.compile(r'/Filter\b')
+_FLATE = re.compile(r'/Filter\s*(?:/FlateDecode|\[\s*/FlateDecode\s*\])')
+_DECODE_PARMS = re.compile(r'/DecodeParms\s*(?:<<[^<>]*>>|\[\s*<<[^<>]*>>\s*\])')
+_IMAGE = re.compile(r'/Subtype\s*/Image\b')
+# ストリーム以外でまとめてよいオブジェクト (ページや注釈など親を持つものは対象外)
+_SHAREABLE_TYPE = re.compile(r'/Type\s*/(Font|FontDescriptor|ExtGState|Encoding)\b')
+
+
+def _stream_key(obj: str) -> tuple:
+    """
+    ストリームの辞書から比較に使うキーを作り、(キー, 展開後の内容で比べるか) を返す
+    無圧縮かFlateだけの画像は /Filter と /DecodeParms も外し、展開後の内容で比べる
+    (画像は幅・高さ・色空間で候補が絞れるため、展開するものが少ない)
+    """
+    key = _LENGTH.sub('', obj)
+    unfiltered = _FLATE.sub('', key)
+    if not _IMAGE.search(key) or _FILTER.search(unfiltered):
+        return key, False
+    return _DECODE_PARMS.sub('', unfiltered), True
+
+
+def _is_shareable(obj: str) -> bool:
+    """
+    ストリーム以外で共有してよいオブジェクトか (色空間などの配列、フォント関連の辞書)
+    """
+    return obj.startswith('[') or _SHAREABLE_TYPE.search(obj) is not None
+
+
+def _rewrite_references(doc, replacements: dict):
+    """
+    replacements (重複xref -> 残すxref) に従い、全オブジェクトの参照を書き換える
+    ストリームは本体を壊さないよう、参照を含むキーだけを書き換える
+    """
+    def replace(match):
+        return f"{replacements.get(int(match.group(1)), int(match.group(1)))} 0 R"
+
+    for xref in range(1, doc.xref_length()):
+        if xref in replacements:
+            continue
+        if doc.xref_is_stream(xref):
+            for key in doc.xref_get_keys(xref):
+                kind, value = doc.xref_get_key(xref, key)
+                if kind in ('xref', 'array', 'dict'):
+                    new_value = _REFERENCE.sub(replace, value)
+                    if new_value != value:
+                        doc.xref_set_key(xref, key, new_value)
+            continue
+        obj = doc.xref_object(xref, compressed=True)
+        new_obj = _REFERENCE.sub(replace, obj)
+        if new_obj != obj:
+            doc.update_object(xref, new_obj)
+
+
+def _resolve(replacements: dict, xref: int) -> int:
+    while xref in replacements:
+        xref = replacements[xref]
+    return xref
+
+
+def dedup_streams(doc) -> tuple:
+    """
+    内容が同じストリーム(画像・フォント・XObject等)を1つにまとめる
+    色空間の配列やフォント辞書など、ストリームが参照する小さなオブジェクトも同様にまとめる
+    バイト列まで同じものは保存時の garbage=4 でもまとまるが、Flate圧縮の圧縮率だけが違う画像
+    (同じロゴを別のツールで作ったPDF等) は展開後の内容で比べないとまとまらない
+    重複側への参照を残す側に付け替えるだけで、重複側は保存時の garbage で取り除かれる
+    SMaskやFontFileのように参照先がまとまると参照元も同一になるため、変化がなくなるまで繰り返す
+    戻り値は (調べたストリームのバイト数, garbage=4 だけでは除けない重複のバイト数)
+    """
+    total_bytes = 0
+    saved_bytes = 0
+    removed = set()
+    originals = {}  # 書き換え前のオブジェクト (garbage=4 でもまとまる重複かの判定に使う)
+    garbage_replacements = {}  # まとめた重複のうち garbage=4 でもまとまるもの
+
+    def as_garbage(xref):
+        return _REFERENCE.sub(lambda match: f"{_resolve(garbage_replacements, int(match.group(1)))} 0 R",
+                              originals[xref])
+
+    first_pass = True
+    while True:
+        # まず辞書(と展開しないものは長さ)で候補を絞り、同じ候補が2つ以上あるときだけ本体を読む
+        candidates = {}
+        for xref in range(1, doc.xref_length()):
+            if xref in removed:
+                continue
+            obj = doc.xref_object(xref, compressed=True)
+            if doc.xref_is_stream(xref):
+                match = _LENGTH.search(obj)
+                length = int(match.group(1)) if match else -1
+                key, decode = _stream_key(obj)
+                if first_pass:
+                    total_bytes += max(length, 0)
+                candidate_key = (key, None if decode else length, True)
+            elif _is_shareable(obj):
+                candidate_key = (obj, 0, False)
+            else:
+                continue
+            if first_pass:
+                originals[xref] = obj
+            candidates.setdefault(candidate_key, []).append(xref)
+        first_pass = False
+
+        replacements = {}
+        for (_, length, is_stream), xrefs in candidates.items():
+            if len(xrefs) < 2:
+                continue
+            # バイト列が同じもの、次に(展開して比べるものは)展開後の内容が同じものをまとめる
+            raws = {}
+            by_raw = {}
+            for xref in xrefs:
+                raws[xref] = (doc.xref_stream_raw(xref) or b'') if is_stream else b''
+                by_raw.setdefault(hashlib.sha256(raws[xref]).digest(), []).append(xref)
+            kept_of = {}
+            if length is None and len(by_raw) > 1:
+                by_content = {}
+                for same_raw in by_raw.values():
+                    digest = hashlib.sha256(doc.xref_stream(same_raw[0]) or b'').digest()
+                    kept_of[same_raw[0]] = by_content.setdefault(digest, same_raw[0])
+            for same_raw in by_raw.values():
+                kept = kept_of.get(same_raw[0], same_raw[0])
+                for xref in same_raw:
+                    if xref == kept:
+                        continue
+                    replacements[xref] = kept
+                    if raws[xref] == raws[kept] and as_garbage(xref) == as_garbage(kept):
+                        garbage_replacements[xref] = kept
+                    else:
+                        saved_bytes += len(raws[xref])
+
+        if not replacements:
+            return total_bytes, saved_bytes
+        _rewrite_references(doc, replacements)
+        removed.update(replacements)
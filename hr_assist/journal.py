@@ -0,0 +1,75 @@
+import os
+import re
+import json
+
+JOURNAL_FILE_NAME = "journal.jsonl"
+
+# 中断時に残りうる書きかけの一時ファイル
+_PARTIAL_FILE = re.compile(r'(_merged_temp\.pdf|_temp_\d+\.pdf|\.compressed|\.tmp)$')
+
+
+def save_pdf_atomic(doc, path: str, **save_options):
+    """
+    一時ファイルに保存してからリネームし、書きかけのPDFが出力先に残らないようにする
+    """
+    temp_path = path + ".tmp"
+    doc.save(temp_path, **save_options)
+    os.replace(temp_path, path)
+
+
+def remove_partial_files(output_folder_path: str) -> int:
+    """
+    前回の実行が中断して残った一時ファイルを出力フォルダから削除し、削除した数を返す
+    """
+    removed = 0
+    for folder, _, file_names in os.walk(output_folder_path):
+        for file_name in file_names:
+            if _PARTIAL_FILE.search(file_name):
+                os.unlink(os.path.join(folder, file_name))
+                removed += 1
+    return removed
+
+
+def load_journal(output_folder_path: str) -> dict:
+    """
+    ジャーナルから完了済みグループの記録を読み込む (グループ名 -> マニフェストと同じ形の記録)
+    書き込み途中で中断した最終行は読み飛ばす
+    """
+    journal_path = os.path.join(output_folder_path, JOURNAL_FILE_NAME)
+    entries = {}
+    if not os.path.isfile(journal_path):
+        return entries
+    with open(journal_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[record['group']] = record['entry']
+    return entries
+
+
+class Journal:
+    """
+    完了したグループを1行ずつ追記するジャーナル
+    1グループごとにfsyncするため、異常終了してもそれまでに完了したグループは残る
+    resumeでなければ前回の内容を消して書き始める
+    """
+
+    def __init__(self, output_folder_path: str, resume=False):
+        self.path = os.path.join(output_folder_path, JOURNAL_FILE_NAME)
+        self.file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        # 書きかけの最終行に続けて追記しないよう改行を補う
+        if resume and self.file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def record(self, group_key: str, entry: dict):
+        self.file.write(json.dumps({'group': group_key, 'entry': entry}, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
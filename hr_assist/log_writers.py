@@ -0,0 +1,112 @@
+import os
+import csv
+import json
+
+
+class LogWriter:
+    """
+    ログ出力の共通インターフェース
+    streamingなライターは処理中にwrite_rowsで逐次書き出すため、途中で異常終了してもそこまでのログが残る
+    それ以外のライターはcloseで台帳全体(分類順)をまとめて書き出す
+    """
+    extension = ''
+    label = ''
+    streaming = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_rows(self, records: list):
+        pass
+
+    def close(self, records: list):
+        pass
+
+
+class CsvLogWriter(LogWriter):
+    extension = '.csv'
+    label = 'CSV'
+    streaming = True
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # Excelで文字化けしないようBOM付きUTF-8で書き出す
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = None
+
+    def write_rows(self, records: list):
+        if not records:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(records[0]))
+            self._writer.writeheader()
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def close(self, records: list):
+        self._file.close()
+
+
+class JsonlLogWriter(LogWriter):
+    extension = '.jsonl'
+    label = 'JSON Lines'
+    streaming = True
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, records: list):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self, records: list):
+        self._file.close()
+
+
+class ExcelLogWriter(LogWriter):
+    extension = '.xlsx'
+    label = 'Excel'
+
+    def close(self, records: list):
+        # pandas/openpyxlは読み込みが重いため、Excel出力時だけimportする
+        import pandas as pd
+
+        pd.DataFrame(records).to_excel(self.path, index=False)
+
+
+class ParquetLogWriter(LogWriter):
+    extension = '.parquet'
+    label = 'Parquet'
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        # pyarrowは任意の依存関係のため、処理を始める前に有無を確認する
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("Parquet形式のログ出力には pyarrow のインストールが必要です") from e
+
+    def close(self, records: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(records), self.path)
+
+
+LOG_WRITERS = {
+    'xlsx': ExcelLogWriter,
+    'csv': CsvLogWriter,
+    'jsonl': JsonlLogWriter,
+    'parquet': ParquetLogWriter,
+}
+
+
+def open_log_writer(log_format: str, folder_path: str, base_name: str) -> LogWriter:
+    """
+    指定形式のログライターを作成する
+    ファイル名は {base_name}{拡張子}
+    """
+    writer_class = LOG_WRITERS[log_format]
+    return writer_class(os.path.join(folder_path, base_name + writer_class.extension))
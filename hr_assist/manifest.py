@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+import hashlib
+
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+def file_signature(file_path: str, previous_files: dict, size=None, mtime=None) -> dict:
+    """
+    ファイルのサイズ・更新日時・内容ハッシュを返す
+    サイズと更新日時が前回と同じならハッシュを再計算せず前回の値を使う
+    走査時に得たsize/mtimeを渡すと、ファイルごとのstatを省く
+    """
+    if size is None or mtime is None:
+        stat = os.stat(file_path)
+        size, mtime = stat.st_size, stat.st_mtime
+    previous = previous_files.get(file_path)
+    if previous and previous['size'] == size and previous['mtime'] == mtime:
+        return previous
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return {'path': file_path, 'size': size, 'mtime': mtime, 'sha256': sha256.hexdigest()}
+
+
+def same_contents(files: list, signatures: list) -> bool:
+    """
+    記録したファイルの一覧と今回の署名が、パス・サイズ・内容ハッシュで一致するか
+    (コピーし直しやtouchで更新日時だけが変わったファイルは変更なしとみなす)
+    """
+    def contents(records):
+        return [(record['path'], record['size'], record['sha256']) for record in records]
+
+    return contents(files) == contents(signatures)
+
+
+def has_errors(entry: dict) -> bool:
+    """
+    グループの記録に結合できなかった(エラーの)ファイルがあるか (一時的な読み込みエラーは次回結合し直す)
+    """
+    return any(record['状態'].startswith('エラー') for record in entry.get('statuses', []))
+
+
+def find_previous_manifest(output_folder_path: str):
+    """
+    今回の出力フォルダ、なければ直近の過去の *_output フォルダからマニフェストを探す
+    戻り値は (マニフェスト, そのフォルダのパス)。見つからなければ ({'groups': {}}, None)
+    """
+    parent_folder = os.path.dirname(os.path.abspath(output_folder_path))
+    if not os.path.isdir(parent_folder):
+        return {'groups': {}}, None
+    current_name = os.path.basename(os.path.abspath(output_folder_path))
+    candidates = [current_name] + sorted(
+        (name for name in os.listdir(parent_folder) if name.endswith('_output') and name < current_name),
+        reverse=True,
+    )
+    for name in candidates:
+        manifest_path = os.path.join(parent_folder, name, MANIFEST_FILE_NAME)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                return json.load(f), os.path.join(parent_folder, name)
+    return {'groups': {}}, None
+
+
+def save_manifest(manifest: dict, output_folder_path: str):
+    """
+    マニフェストを一時ファイル経由で書き出す
+    """
+    manifest_path = os.path.join(output_folder_path, MANIFEST_FILE_NAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+
+
+def outputs_present(entry: dict, previous_folder: str) -> bool:
+    """
+    前回の出力がすべて残っているか (ファイルには触れないため、ドライランの判定にも使える)
+    """
+    return previous_folder is not None and all(
+        os.path.isfile(os.path.join(previous_folder, path)) for path in entry.get('outputs', [])
+    )
+
+
+def reuse_group_outputs(entry: dict, previous_folder: str, output_folder_path: str) -> bool:
+    """
+    入力が変わっていないグループの前回出力を今回の出力フォルダへハードリンク(不可ならコピー)する
+    前回の出力が欠けている場合はFalseを返し、結合し直す
+    """
+    if not outputs_present(entry, previous_folder):
+        return False
+    sources = [os.path.join(previous_folder, path) for path in entry['outputs']]
+    if os.path.samefile(previous_folder, output_folder_path):
+        return True
+
+    for source, path in zip(sources, entry['outputs']):
+        destination = os.path.join(output_folder_path, path)
+        if os.path.exists(destination):
+            os.unlink(destination)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+    return True
+
+
+def remove_stale_outputs(entry: dict, previous_folder: str, output_folder_path: str):
+    """
+    同じ出力フォルダで結合し直す場合、前回の分割パーツが残らないよう削除する
+    """
+    if previous_folder is None or not os.path.samefile(previous_folder, output_folder_path):
+        return
+    for path in entry['outputs']:
+        path = os.path.join(output_folder_path, path)
+        if os.path.isfile(path):
+            os.unlink(path)
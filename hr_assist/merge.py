@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from hr_assist.classify import clean_filename, sort_key
+from hr_assist.compress import compress_document, write_compress_report
+from hr_assist.ocr import ocr_document, ocr_executor
+from hr_assist.prefetch import PrefetchOptions, prefetch_files
+from hr_assist.profiling import StageTimer
+from hr_assist.split import PartWriter, remove_group_outputs
+from hr_assist.status_ledger import FileStatus
+
+# 出力ファイル1つあたりの上限サイズ (9MB)
+LIMIT_SIZE = 9 * (1024 * 1024)
+
+logger = logging.getLogger(__name__)
+
+
+def _insert_sources(group_statuses: list, insert, timer: StageTimer, prefetch=None, sizes=None, read_paths=None,
+                    progress=None):
+    """
+    group_statusesの順にPDFを開き、insert(src_doc, status)に渡す
+    read_pathsにパス -> 実際に読むパス(事前検査で修復したファイル等)があればそちらを読む
+    ファイルはprefetch (PrefetchOptions) に従い、結合中に次のファイルをスレッドで先読みしてメモリから開く
+    sizesには走査時に得たファイルサイズを渡せる (先読みの上限計算に使う)
+    各ファイルの状態・処理時間・バイト数・ページ数もここで記録する
+    progressを渡すと、ファイルを1つ処理するごとにその入力バイト数で呼ぶ (進捗バー用)
+    """
+    if prefetch is None:
+        prefetch = PrefetchOptions()
+
+    read_paths = read_paths or {}
+    prefetched = prefetch_files([read_paths.get(status.path, status.path) for status in group_statuses], prefetch, sizes)
+    for status, (_, future) in zip(group_statuses, prefetched):
+        pdf_file = status.path
+        logger.debug("結合中のPDFファイル: %s", pdf_file)
+        started = time.perf_counter()
+        try:
+            # 先読みが終わっていなければここで待つ (待ち時間もオープンに含める)
+            with timer.measure('オープン') as measurement:
+                data = future.result()
+                measurement.bytes_in = status.bytes_in = len(data)
+                src_doc = fitz.open(stream=data, filetype='pdf')
+            with src_doc:
+                status.pages = len(src_doc)
+                insert(src_doc, status)
+            status.state = '結合済'
+        except Exception as e:
+            logger.warning("%s の処理中にエラーが発生しました: %s", pdf_file, e)
+            status.state = f'エラー: {e}'
+        status.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(sizes[pdf_file] if sizes and pdf_file in sizes else status.bytes_in)
+
+
+def merge_group(subfolder_name: str, row: str, files: list, sub_output_folder_path: str,
+                compress=None, prefetch=None, sizes=None, preflight=None, ocr=None, progress=None,
+                readings=None, romaji=False):
+    """
+    1つの(サブフォルダ, 行)グループを結合して保存する
+    ソースPDFをページ単位で出力パートに追記し、9MBを超える直前で次のパートに切り替える (結合と分割を1回で行う)
+    フォルダ名に「履歴書」が含まれる場合は分割しない
+    compress (CompressOptions) を渡すと、入力の合計が9MBを超えるグループは挿入前に画像を再圧縮する
+    prefetch/sizes は _insert_sources にそのまま渡す
+    preflight (パス -> PreflightResult) を渡すと、隔離されたファイルは結合せず、修復したファイルは修復版を読む
+    ページの見積もりも事前検査の結果を使う
+    ocr (OcrOptions) を渡すと、スキャンしたページに透明なテキストレイヤーを重ねてから (再圧縮の前に) 挿入する
+    progress はファイルごとに入力バイト数で呼ぶ (隔離して結合しないファイルも含む)
+    readings/romaji は分類と同じ読みで行内を並べるために sort_key に渡す
+    出力PDFにはファイルごとのしおりを付け、出力ファイルパスの最後にパートとページ範囲の索引ファイルを含める
+    ワーカープロセスからも呼ばれるため、結果は (グループ内ファイルの状態レコード, 出力ファイルパス, 段階ごとの計測) で返す
+    """
+    timer = StageTimer()
+    logger.debug("%s/%s に含まれるファイル数: %d", subfolder_name, row, len(files))
+    sorted_files = sorted(files, key=lambda path: sort_key(path, readings, romaji))
+    group_statuses = [FileStatus(f, '結合予定', row) for f in sorted_files]
+
+    preflight = preflight or {}
+    merge_statuses = []
+    read_paths = {}
+    for status in group_statuses:
+        result = preflight.get(status.path)
+        if result is not None and result.state == '隔離':
+            status.state = f'隔離: {result.reason}'
+            logger.warning("%s は事前検査で隔離されたため結合しません (%s)", status.path, result.reason)
+            if progress is not None:
+                progress(sizes[status.path] if sizes and status.path in sizes else os.path.getsize(status.path))
+            continue
+        if result is not None and result.repaired_path:
+            read_paths[status.path] = result.repaired_path
+        merge_statuses.append(status)
+
+    output_pdf_path = os.path.join(sub_output_folder_path, clean_filename(f"{subfolder_name}_{row}.pdf"))
+    remove_group_outputs(output_pdf_path)
+    writer = PartWriter(output_pdf_path, None if "履歴書" in subfolder_name else LIMIT_SIZE, timer)
+
+    # 分割数を減らすため、上限を超えるグループは先に画像を再圧縮する (履歴書も1ファイルのまま小さくなる)
+    total_bytes = sum(sizes.values()) if sizes else sum(os.path.getsize(f) for f in files)
+    compressing = compress is not None and total_bytes > LIMIT_SIZE
+    page_sizes = []
+    ocr_counts = [0, 0]  # OCRしたページ数, キャッシュから得たページ数
+    use_pool = compressing and compress.workers > 1
+    with ProcessPoolExecutor(max_workers=compress.workers) if use_pool else nullcontext() as executor, \
+            ocr_executor(ocr) if ocr is not None else nullcontext() as ocr_pool:
+        def insert(src_doc, status):
+            result = preflight.get(status.path)
+            costs = result.costs if result is not None and result.costs else None
+            if ocr is not None:
+                ocr_pages, cached_pages = ocr_document(src_doc, ocr, timer, ocr_pool)
+                ocr_counts[0] += ocr_pages
+                ocr_counts[1] += cached_pages
+                if ocr_pages or cached_pages:
+                    # テキストレイヤーの分だけページが変わるため見積もり直す
+                    costs = None
+            if compressing:
+                costs, source_page_sizes = compress_document(src_doc, compress, timer, executor)
+                page_sizes.extend(source_page_sizes)
+            writer.append(src_doc, costs, status.path)
+
+        _insert_sources(merge_statuses, insert, timer, prefetch, sizes, read_paths, progress)
+    output_paths = writer.close()
+
+    if writer.saved_bytes:
+        logger.debug("%s の重複リソースを除去しました (約%.2fMB削減)", row, writer.saved_bytes / 1024 / 1024)
+    if any(ocr_counts):
+        logger.debug("%s のOCRを行いました (%dページ, キャッシュ %dページ)", row, *ocr_counts)
+    if page_sizes:
+        write_compress_report(f"{os.path.splitext(output_pdf_path)[0]}_再圧縮レポート", page_sizes)
+        before = sum(page_before for page_before, _ in page_sizes)
+        after = sum(page_after for _, page_after in page_sizes)
+        logger.debug("%s の画像を再圧縮しました (約%.2fMB → %.2fMB)", row, before / 1024 / 1024, after / 1024 / 1024)
+
+    return group_statuses, output_paths, timer
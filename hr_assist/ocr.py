@@ -0,0 +1,179 @@
+import os
+import shutil
+import hashlib
+import logging
+import subprocess
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# 出力フォルダ内のOCR結果のキャッシュ (描画したページのハッシュ -> テキストだけのPDF)
+CACHE_FOLDER_NAME = "_OCR"
+
+
+@dataclass
+class OcrOptions:
+    """
+    テキストレイヤーのOCRの設定
+    cache_foldersは結果を探すフォルダ (先頭が今回の出力フォルダのキャッシュで、新しい結果もここに保存する)
+    """
+    language: str = 'jpn'
+    dpi: int = 300
+    workers: int = 1
+    command: str = 'tesseract'
+    timeout: float = 120
+    cache_folders: tuple = ()
+
+
+def check_tesseract(command: str):
+    """
+    Tesseractは任意の依存関係のため、処理を始める前に有無を確認する
+    """
+    if shutil.which(command) is None:
+        raise RuntimeError(f"OCRには Tesseract ({command}) のインストールが必要です")
+
+
+def needs_ocr(page) -> bool:
+    """
+    抽出できるテキストがなく、画像を含むページ (スキャンしたページ) か
+    """
+    return bool(page.get_images()) and not page.get_text('text').strip()
+
+
+def page_hash(png: bytes, options: OcrOptions) -> str:
+    """
+    描画したページとOCRの設定からキャッシュのキーを作る (同じページは言語と解像度が同じなら再OCRしない)
+    """
+    digest = hashlib.sha256(png)
+    digest.update(f"|{options.language}|{options.dpi}".encode())
+    return digest.hexdigest()
+
+
+def _run_tesseract(png: bytes, options: OcrOptions) -> bytes:
+    """
+    1ページ分の画像をTesseractに渡し、テキストだけ(画像なし)のPDFを返す
+    Tesseract自体のスレッドは1つに抑え、並列度はworkersで決める
+    """
+    result = subprocess.run(
+        [options.command, 'stdin', 'stdout', '-l', options.language, '--dpi', str(options.dpi),
+         '-c', 'textonly_pdf=1', 'pdf'],
+        input=png, capture_output=True, timeout=options.timeout, check=True,
+        env={**os.environ, 'OMP_THREAD_LIMIT': '1'},
+    )
+    return result.stdout
+
+
+def _cached(digest: str, options: OcrOptions):
+    """
+    キャッシュにあるテキストだけのPDFのバイト列を返す (前回の出力フォルダのものは今回のキャッシュにも置く)
+    """
+    for folder in options.cache_folders:
+        path = os.path.join(folder, f"{digest}.pdf")
+        if os.path.isfile(path):
+            if folder != options.cache_folders[0]:
+                _store(digest, None, options, source=path)
+            with open(path, 'rb') as f:
+                return f.read()
+    return None
+
+
+def _store(digest: str, data, options: OcrOptions, source=None):
+    if not options.cache_folders:
+        return
+    os.makedirs(options.cache_folders[0], exist_ok=True)
+    path = os.path.join(options.cache_folders[0], f"{digest}.pdf")
+    if source is not None:
+        try:
+            os.link(source, path)
+        except OSError:
+            shutil.copy2(source, path)
+        return
+    # 並列に動く他のワーカーと一時ファイルが重ならないようプロセスIDを付ける
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def carry_cache(previous_folder, output_folder_path: str) -> int:
+    """
+    前回の出力フォルダのキャッシュを今回の出力フォルダにハードリンクで引き継ぎ、件数を返す
+    グループを再利用してOCRしなかった実行でも、次の実行がキャッシュを使えるようにする
+    """
+    if previous_folder is None or os.path.samefile(previous_folder, output_folder_path):
+        return 0
+    source_folder = os.path.join(previous_folder, CACHE_FOLDER_NAME)
+    if not os.path.isdir(source_folder):
+        return 0
+    options = OcrOptions(cache_folders=(os.path.join(output_folder_path, CACHE_FOLDER_NAME),))
+    carried = 0
+    for name in os.listdir(source_folder):
+        digest, ext = os.path.splitext(name)
+        if ext == '.pdf' and not os.path.exists(os.path.join(options.cache_folders[0], name)):
+            _store(digest, None, options, source=os.path.join(source_folder, name))
+            carried += 1
+    return carried
+
+
+def ocr_document(doc, options: OcrOptions, timer, executor=None) -> tuple:
+    """
+    docのスキャンしたページに透明なテキストレイヤーを重ねる (元の画像・内容はそのまま)
+    テキストのあるページは飛ばし、描画したページのハッシュでキャッシュした結果があればOCRしない
+    executor (ThreadPoolExecutor) を渡すと、ページごとのTesseractのプロセスを並列に実行する
+    戻り値は (OCRしたページ数, キャッシュから得たページ数)
+    """
+    pending = []
+    submitted = {}  # 同じ内容のページ(白紙等)は1度だけOCRする
+    cached = 0
+    with timer.measure('OCR') as measurement:
+        for page in doc:
+            if not needs_ocr(page):
+                continue
+            png = page.get_pixmap(dpi=options.dpi, colorspace=fitz.csGRAY).tobytes('png')
+            digest = page_hash(png, options)
+            data = _cached(digest, options)
+            if data is not None:
+                cached += 1
+                _overlay(page, data)
+                continue
+            if digest not in submitted:
+                submitted[digest] = executor.submit(_run_tesseract, png, options) if executor is not None else None
+            pending.append((page.number, digest, png))
+
+        results = {}
+        for page_num, digest, png in pending:
+            if digest not in results:
+                future = submitted[digest]
+                try:
+                    results[digest] = future.result() if future is not None else _run_tesseract(png, options)
+                except (OSError, subprocess.SubprocessError) as e:
+                    logger.warning("%dページ目のOCRに失敗しました: %s", page_num + 1, e)
+                    results[digest] = None
+                    continue
+                _store(digest, results[digest], options)
+                measurement.bytes_out += len(results[digest])
+            if results[digest] is not None:
+                _overlay(doc[page_num], results[digest])
+    return len(submitted), cached
+
+
+def _overlay(page, data: bytes):
+    """
+    テキストだけのPDF(Tesseractの出力は透明な文字)をページ全体に重ねる
+    文字が認識されなかったページには何も足さない
+    """
+    with fitz.open(stream=data, filetype='pdf') as text_doc:
+        if not text_doc[0].get_text('text').strip():
+            return
+        page.show_pdf_page(page.rect, text_doc, 0, overlay=True)
+
+
+def ocr_executor(options: OcrOptions):
+    """
+    Tesseractのプロセスを並列に起動するためのスレッドプール (workersが1ならその場で1ページずつ実行する)
+    """
+    return ThreadPoolExecutor(max_workers=options.workers) if options.workers > 1 else nullcontext()
@@ -0,0 +1,67 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass
+class PrefetchOptions:
+    """
+    先読みの設定 (threadsが0なら先読みせず、その場で読み込む)
+    """
+    max_bytes: int = 64 * 1024 * 1024
+    threads: int = 4
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _completed(function, *args) -> Future:
+    """
+    スレッドを使わずにその場で実行し、結果(または例外)を持つFutureとして返す
+    """
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def prefetch_files(paths: list, options: PrefetchOptions, sizes=None):
+    """
+    pathsの順に (パス, 内容のFuture) を返すジェネレータ
+    呼び出し側が今のファイルを処理している間に、次のファイルをスレッドプールで読み込んでおく
+    先読み中の合計バイト数はoptions.max_bytes以内に抑える (ただし最低1ファイルは先読みする)
+    読み込みの例外は Future.result() で呼び出し側に伝わる
+    sizesにパスごとのサイズがあればそれを使い、なければos.path.getsizeで調べる
+    """
+    if options.threads <= 0:
+        for path in paths:
+            yield path, _completed(_read_bytes, path)
+        return
+
+    def size_of(path):
+        if sizes and path in sizes:
+            return sizes[path]
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=options.threads) as executor:
+        remaining = deque((path, size_of(path)) for path in paths)
+        pending = deque()
+        in_flight = 0
+        while remaining or pending:
+            while remaining and (not pending or in_flight + remaining[0][1] <= options.max_bytes):
+                path, size = remaining.popleft()
+                in_flight += size
+                pending.append((path, size, executor.submit(_read_bytes, path)))
+            path, size, future = pending.popleft()
+            yield path, future
+            # 呼び出し側が次を要求した時点で、前のファイルの内容は使い終わっている
+            in_flight -= size
+
@@ -0,0 +1,231 @@
+import os
+import json
+import shutil
+import multiprocessing
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+
+import fitz  # PyMuPDF
+
+from hr_assist.split import estimate_page_costs
+
+CACHE_FILE_NAME = "preflight.json"
+# costsの共有オブジェクトのキーの形式 (キャッシュの互換性の判定に使う)
+COST_KEYS = "sha256"
+REPAIRED_FOLDER_NAME = "_修復"
+QUARANTINE_FOLDER_NAME = "_隔離"
+
+# 判定
+OK = 'OK'
+REPAIR = '修復'
+QUARANTINE = '隔離'
+
+
+@dataclass(slots=True)
+class PreflightResult:
+    """
+    1ファイル分の事前検査の結果 (内容ハッシュをキーにキャッシュする)
+    page_sizesは "幅x高さ"(ポイント) ごとのページ数、costsは結合に使うPDFのestimate_page_costsの結果
+    修復したファイルはrepaired_pathから読む
+    """
+    state: str = OK
+    reason: str = ''
+    pages: int = 0
+    encrypted: bool = False
+    page_sizes: dict = field(default_factory=dict)
+    costs: list = field(default_factory=list)
+    cost_keys: str = COST_KEYS
+    repaired_path: str = ''
+
+    def to_cache(self) -> dict:
+        record = asdict(self)
+        del record['repaired_path']
+        return record
+
+    @classmethod
+    def from_cache(cls, record: dict) -> "PreflightResult":
+        # JSONではタプルがリストになるため戻す (共有オブジェクトのキーは内容のハッシュの文字列のまま)
+        return cls(**{**record, 'costs': [(own, shared) for own, shared in record['costs']]})
+
+    def to_record(self, path: str) -> dict:
+        """
+        ログ出力用の辞書に変換する
+        """
+        return {
+            'ファイルパス': path,
+            '判定': self.state,
+            '理由': self.reason,
+            'ページ数': self.pages,
+            '暗号化': '有' if self.encrypted else '',
+            '用紙サイズ': ', '.join(f"{size}:{count}" for size, count in self.page_sizes.items()),
+        }
+
+
+def _quarantine(reason: str) -> dict:
+    return PreflightResult(state=QUARANTINE, reason=reason).to_cache()
+
+
+def check_pdf(task: tuple) -> dict:
+    """
+    1ファイルを検査し、必要なら修復版をrepaired_pathに保存する (ワーカープロセスで実行される)
+    ヘッダ、xref(MuPDFが開くときに修復したか)、暗号化、ページ数、全ページの読み込みと用紙サイズを調べる
+    戻り値はPreflightResult.to_cacheの辞書
+    MuPDFの例外はプロセス間で受け渡せないため、すべてここで隔離の結果に変える
+    """
+    try:
+        return _check_pdf(*task)
+    except Exception as e:
+        return _quarantine(f'検査中にエラーが発生しました: {e}')
+
+
+def _check_pdf(path: str, repaired_path: str) -> dict:
+    try:
+        with open(path, 'rb') as f:
+            if b'%PDF-' not in f.read(1024):
+                return _quarantine('PDFのヘッダがありません')
+        doc = fitz.open(path)
+    except Exception as e:
+        return _quarantine(f'開けません: {e}')
+
+    with doc:
+        if doc.needs_pass:
+            return _quarantine('パスワードで保護されています')
+        if len(doc) == 0:
+            return _quarantine('ページがありません')
+        try:
+            page_sizes = Counter(f"{round(page.rect.width)}x{round(page.rect.height)}" for page in doc)
+        except Exception as e:
+            return _quarantine(f'ページを読み込めません: {e}')
+
+        result = PreflightResult(
+            pages=len(doc),
+            encrypted=bool(doc.metadata.get('encryption')),
+            page_sizes=dict(page_sizes.most_common()),
+        )
+        if not doc.is_repaired:
+            result.costs = estimate_page_costs(doc)
+            return result.to_cache()
+
+        # xrefが壊れていてもMuPDFが読み直せたものは、1度だけ保存し直して以後はそれを使う
+        result.state = REPAIR
+        result.reason = 'xrefが壊れていたため修復しました'
+        try:
+            os.makedirs(os.path.dirname(repaired_path), exist_ok=True)
+            doc.save(repaired_path + ".tmp", garbage=3, deflate=True)
+            os.replace(repaired_path + ".tmp", repaired_path)
+        except Exception as e:
+            return _quarantine(f'修復できません: {e}')
+
+    # 保存し直したものが読めない場合は修復できなかったものとして扱う
+    try:
+        with fitz.open(repaired_path) as repaired:
+            result.costs = estimate_page_costs(repaired)
+    except Exception as e:
+        os.unlink(repaired_path)
+        return _quarantine(f'修復できません: {e}')
+    return result.to_cache()
+
+
+def _run_checks(tasks: list, workers: int, timeout: float) -> dict:
+    """
+    tasksをworkers個のプロセスで検査し、パス -> 結果の辞書を返す
+    timeout秒待っても終わらないファイルは隔離とし、固まったワーカーを止めるためプールを作り直して残りを続ける
+    """
+    results = {}
+    remaining = list(tasks)
+    while remaining:
+        with multiprocessing.Pool(max(workers, 1)) as pool:
+            submitted = [(task, pool.apply_async(check_pdf, (task,))) for task in remaining]
+            remaining = []
+            for index, (task, async_result) in enumerate(submitted):
+                try:
+                    results[task[0]] = async_result.get(timeout)
+                except multiprocessing.TimeoutError:
+                    results[task[0]] = _quarantine(f'{timeout:g}秒以内に検査が終わりません')
+                    for other_task, other_result in submitted[index + 1:]:
+                        if other_result.ready():
+                            results[other_task[0]] = other_result.get()
+                        else:
+                            remaining.append(other_task)
+                    break
+    return results
+
+
+def _load_cache(folders: list) -> dict:
+    """
+    各フォルダの検査結果キャッシュを読み込んで1つにまとめる (先のフォルダを優先)
+    値は (キャッシュがあったフォルダ, 結果の辞書)
+    """
+    cache = {}
+    for folder in reversed([folder for folder in folders if folder]):
+        cache_path = os.path.join(folder, CACHE_FILE_NAME)
+        if os.path.isfile(cache_path):
+            with open(cache_path, encoding='utf-8') as f:
+                cache.update({digest: (folder, record) for digest, record in json.load(f).items()})
+    return cache
+
+
+def _link_or_copy(source: str, destination: str):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def run_preflight(files: dict, output_folder_path: str, previous_folder=None, workers=1, timeout=60.0) -> tuple:
+    """
+    結合前に全ファイルを並列に検査する (files: パス -> 内容のsha256)
+    結果は内容ハッシュで出力フォルダのキャッシュに保存し、前回の出力フォルダのキャッシュも再利用する
+    修復したファイルは出力フォルダの _修復 に、隔離したファイルは _隔離 にコピーを置く
+    戻り値は パス -> PreflightResult と、キャッシュから得た件数
+    """
+    repaired_folder = os.path.join(output_folder_path, REPAIRED_FOLDER_NAME)
+    quarantine_folder = os.path.join(output_folder_path, QUARANTINE_FOLDER_NAME)
+
+    cache = _load_cache([output_folder_path, previous_folder])
+    records = {}
+    tasks = []
+    for path, digest in files.items():
+        repaired_path = os.path.join(repaired_folder, f"{digest}.pdf")
+        # 共有オブジェクトをxrefで区別していた頃のキャッシュは使わず、検査し直す
+        if digest in cache and cache[digest][1].get('cost_keys') == COST_KEYS:
+            folder, record = cache[digest]
+            if record['state'] != REPAIR:
+                records[path] = record
+                continue
+            # 修復版は前回のフォルダにあればリンクして使う
+            cached_repair = os.path.join(folder, REPAIRED_FOLDER_NAME, f"{digest}.pdf")
+            if os.path.isfile(cached_repair):
+                if not os.path.exists(repaired_path):
+                    os.makedirs(repaired_folder, exist_ok=True)
+                    _link_or_copy(cached_repair, repaired_path)
+                records[path] = record
+                continue
+        tasks.append((path, repaired_path))
+
+    cached = len(records)
+    records.update(_run_checks(tasks, workers, timeout))
+
+    # 同じ出力フォルダの既存のキャッシュ(--resume等)は引き継ぐ
+    results = {}
+    new_cache = {digest: record for digest, (folder, record) in cache.items() if folder == output_folder_path}
+    for path, record in records.items():
+        result = PreflightResult.from_cache(record)
+        digest = files[path]
+        if result.state == REPAIR:
+            result.repaired_path = os.path.join(repaired_folder, f"{digest}.pdf")
+        elif result.state == QUARANTINE:
+            os.makedirs(quarantine_folder, exist_ok=True)
+            destination = os.path.join(quarantine_folder, f"{digest[:12]}_{os.path.basename(path)}")
+            if not os.path.exists(destination):
+                _link_or_copy(path, destination)
+        # 時間切れは一時的な原因もありうるため、キャッシュせず次回も検査する
+        if not (result.state == QUARANTINE and result.reason.endswith('検査が終わりません')):
+            new_cache[digest] = record
+        results[path] = result
+
+    cache_path = os.path.join(output_folder_path, CACHE_FILE_NAME)
+    with open(cache_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(new_cache, f, ensure_ascii=False)
+    os.replace(cache_path + ".tmp", cache_path)
+    return results, cached
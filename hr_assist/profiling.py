@@ -0,0 +1,84 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class StageTiming:
+    """
+    1つの処理段階の累計 (実時間・CPU時間・入出力バイト数・回数)
+    """
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    count: int = 0
+
+    def add(self, other: "StageTiming"):
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.count += other.count
+
+
+class StageTimer:
+    """
+    段階名ごとに処理時間とバイト数を集計する
+    ワーカープロセスから結果として返せるよう、中身は単純なdictとdataclassだけにしている
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def measure(self, stage: str, bytes_in: int = 0):
+        """
+        withブロックの実時間とCPU時間をstageに加算する
+        出力バイト数はブロック内で yield された StageTiming の bytes_out に設定する
+        """
+        measurement = StageTiming(bytes_in=bytes_in, count=1)
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield measurement
+        finally:
+            measurement.wall = time.perf_counter() - wall_started
+            measurement.cpu = time.process_time() - cpu_started
+            self.stages.setdefault(stage, StageTiming()).add(measurement)
+
+    def merge(self, other: "StageTimer"):
+        for stage, timing in other.stages.items():
+            self.stages.setdefault(stage, StageTiming()).add(timing)
+
+    def to_records(self, **labels) -> list:
+        """
+        ログ出力用の辞書のリストに変換する (labelsは各行の先頭に付ける列)
+        """
+        return [
+            {
+                **labels,
+                '段階': stage,
+                '回数': timing.count,
+                '実時間(秒)': round(timing.wall, 4),
+                'CPU時間(秒)': round(timing.cpu, 4),
+                '入力バイト数': timing.bytes_in,
+                '出力バイト数': timing.bytes_out,
+            }
+            for stage, timing in self.stages.items()
+        ]
+
+
+def timing_report(group_timers: dict, run_timer: StageTimer) -> list:
+    """
+    (サブフォルダ, 行)ごとのタイマーから、行ごと・サブフォルダ合計・全体のタイミング表を作る
+    """
+    records = []
+    subfolder_totals = {}
+    for (subfolder_name, row), timer in group_timers.items():
+        records.extend(timer.to_records(サブフォルダ=subfolder_name, 行=row))
+        subfolder_totals.setdefault(subfolder_name, StageTimer()).merge(timer)
+    for subfolder_name, timer in subfolder_totals.items():
+        records.extend(timer.to_records(サブフォルダ=subfolder_name, 行='合計'))
+    records.extend(run_timer.to_records(サブフォルダ='全体', 行=''))
+    return records
@@ -0,0 +1,307 @@
+import os
+import json
+import shutil
+import logging
+
+import fitz  # PyMuPDF
+
+from hr_assist.bundle_index import build_index, index_path, load_index, part_toc, write_index
+from hr_assist.classify import load_readings, sort_key
+from hr_assist.dedup import dedup_streams
+from hr_assist.journal import save_pdf_atomic
+from hr_assist.manifest import MANIFEST_FILE_NAME, save_manifest
+from hr_assist.merge import LIMIT_SIZE
+from hr_assist.profiling import StageTimer
+from hr_assist.split import split_document
+
+logger = logging.getLogger(__name__)
+
+
+def _load_bundle(base_output_path: str) -> tuple:
+    """
+    索引を読み込み、パートごとの [パス, ページ数, バイト数, [ソースのパス, 開始, 終了(排他)]のリスト] を作る
+    パート内のページ番号は0始まり
+    """
+    path = index_path(base_output_path)
+    if not os.path.isfile(path):
+        raise ValueError(f"{path} がありません (combineで結合し直してください)")
+    index = load_index(path)
+    folder = os.path.dirname(base_output_path)
+    parts = [[os.path.join(folder, part['file']), part['pages'], part['bytes'], []] for part in index['parts']]
+    for entry in index['entries']:
+        for span in entry['spans']:
+            parts[span['part'] - 1][3].append([entry['path'], span['start'] - 1, span['end']])
+    return index, parts
+
+
+def find_applicant(index: dict, name: str) -> dict:
+    """
+    索引から応募者名 (拡張子なし・ありのファイル名) に一致する項目を探す
+    """
+    matches = [entry for entry in index['entries'] if name in (entry['title'], os.path.basename(entry['path']))]
+    if not matches:
+        raise ValueError(f"{name} は索引にありません")
+    if len(matches) > 1:
+        raise ValueError(f"{name} に一致する応募者が{len(matches)}件あります (ファイル名で指定してください)")
+    return matches[0]
+
+
+def extract_applicant(base_output_path: str, name: str, output_pdf_path: str) -> int:
+    """
+    1人分のページを結合済みPDFから取り出してoutput_pdf_pathに保存し、ページ数を返す
+    索引のページ範囲から該当するパーツだけを開く
+    """
+    index, _ = _load_bundle(base_output_path)
+    entry = find_applicant(index, name)
+    folder = os.path.dirname(base_output_path)
+    extracted = fitz.open()
+    for span in entry['spans']:
+        with fitz.open(os.path.join(folder, index['parts'][span['part'] - 1]['file'])) as part:
+            extracted.insert_pdf(part, from_page=span['start'] - 1, to_page=span['end'] - 1)
+    pages = len(extracted)
+    save_pdf_atomic(extracted, output_pdf_path, garbage=4, deflate=True)
+    extracted.close()
+    return pages
+
+
+def _check_source(source: str):
+    """
+    パーツを書き換える前に、差し替え・追加するPDFが開けることを確かめる
+    """
+    if not os.path.isfile(source):
+        raise ValueError(f"{source} がありません")
+    try:
+        with fitz.open(source) as src_doc:
+            if src_doc.needs_pass:
+                raise ValueError(f"{source} はパスワードで保護されています")
+            if len(src_doc) == 0:
+                raise ValueError(f"{source} にページがありません")
+    except RuntimeError as e:
+        raise ValueError(f"{source} を開けません: {e}")
+
+
+def _unshare(path: str):
+    """
+    前回の出力フォルダとハードリンクで共有しているファイルは、書き換える前に複製して切り離す
+    """
+    if os.stat(path).st_nlink > 1:
+        shutil.copy2(path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+def _shift(entries: list, page: int, delta: int):
+    for entry in entries:
+        if entry[1] >= page:
+            entry[1] += delta
+            entry[2] += delta
+
+
+def _rewrite_part(part: list, temp_base: str, name_path, source, position, limit_size, timer: StageTimer) -> tuple:
+    """
+    1つのパーツから応募者のページを削除し、sourceのページをpositionに挿入する
+    追加だけで上限に収まる場合は増分保存で済ませる
+    ページを削除した場合は削除したページの内容がファイルに残らないよう、不要なオブジェクトを除いて保存し直す
+    (上限を超える場合はこのパーツを分割し直す)
+    戻り値は (新しいパーツのリスト, 削除する元のファイル)
+    """
+    path, _, _, entries = part
+    _unshare(path)
+    doc = fitz.open(path)
+
+    deleted = False
+    with timer.measure('挿入'):
+        for entry in [entry for entry in entries if entry[0] == name_path]:
+            deleted = True
+            doc.delete_pages(entry[1], entry[2] - 1)
+            entries.remove(entry)
+            _shift(entries, entry[2], entry[1] - entry[2])
+        if source is not None and position is not None:
+            with fitz.open(source) as src_doc:
+                inserted = len(src_doc)
+                doc.insert_pdf(src_doc, start_at=position)
+            _shift(entries, position, inserted)
+            entries.append([source, position, position + inserted])
+            entries.sort(key=lambda entry: entry[1])
+
+    if len(doc) == 0:
+        doc.close()
+        return [], path
+
+    pages = len(doc)
+    doc.set_toc(part_toc(entries, 0, pages))
+    if not deleted and doc.can_save_incrementally():
+        with timer.measure('パート保存') as measurement:
+            doc.saveIncr()
+            measurement.bytes_out = size = os.path.getsize(path)
+        if limit_size is None or size <= limit_size:
+            doc.close()
+            return [[path, pages, size, entries]], None
+
+    # 削除した場合と増分保存で上限を超えた場合は、不要になったオブジェクトを除いてこのパーツだけを保存し直す
+    # (上限を超えていれば分割する)
+    with timer.measure('重複除去'):
+        dedup_streams(doc)
+    toc = lambda page_start, page_end: part_toc(entries, page_start, page_end)  # noqa: E731
+    temps = split_document(doc, temp_base, limit_size or float('inf'), timer, toc=toc)
+    doc.close()
+
+    new_parts = []
+    offset = 0
+    for temp_path, pages, size in temps:
+        part_entries = [
+            [entry_path, max(start, offset) - offset, min(end, offset + pages) - offset]
+            for entry_path, start, end in entries
+            if start < offset + pages and end > offset
+        ]
+        new_parts.append([temp_path, pages, size, part_entries])
+        offset += pages
+    return new_parts, path
+
+
+def _rename_parts(base_output_path: str, parts: list, removed: list) -> list:
+    """
+    パーツを最終的なファイル名 (1つなら base_output_path、複数なら {base}-{n}) にそろえる
+    番号のずれたパーツは、移動先が他のパーツの元のファイルでなくなった順にリネームする
+    """
+    for path in removed:
+        os.unlink(path)
+    base_name, ext = os.path.splitext(base_output_path)
+    targets = [base_output_path] if len(parts) == 1 else [f"{base_name}-{n}{ext}" for n in range(1, len(parts) + 1)]
+
+    moves = [(part, target) for part, target in zip(parts, targets) if part[0] != target]
+    while moves:
+        sources = {part[0] for part, _ in moves}
+        ready = [(part, target) for part, target in moves if target not in sources]
+        if not ready:
+            raise RuntimeError(f"{base_output_path} のパーツをリネームできません")
+        for part, target in ready:
+            os.replace(part[0], target)
+            part[0] = target
+        moves = [move for move in moves if move not in ready]
+    return targets
+
+
+def _global_entries(parts: list) -> list:
+    """
+    パーツごとのページ範囲を通しのページ範囲に戻す (パーツをまたぐ応募者は1つにまとめる)
+    """
+    entries = []
+    offset = 0
+    for _, pages, _, part_entries in parts:
+        for path, start, end in part_entries:
+            if entries and entries[-1][0] == path and entries[-1][2] == offset + start:
+                entries[-1][2] = offset + end
+            else:
+                entries.append([path, offset + start, offset + end])
+        offset += pages
+    return entries
+
+
+def rebuild_bundle(base_output_path: str, name=None, source=None, limit_size=LIMIT_SIZE, timer=None,
+                   readings=None, romaji=False) -> list:
+    """
+    結合済みのPDF ({サブフォルダ}_{行}.pdf、分割済みなら番号なしのパス) の1人分を書き換える
+    name と source: 応募者nameのページをsourceのPDFに差し替える
+    name のみ: 応募者nameのページを削除する
+    source のみ: sourceのPDFを50音順の位置に追加する
+    索引から該当するパーツだけを開いて書き換え、他のパーツは番号のリネーム以外触らない
+    追加する位置は結合時と同じ読み (readings/romaji を sort_key に渡す) で決める
+    戻り値は出力したファイルパスのリスト (最後が索引ファイル)
+    """
+    if timer is None:
+        timer = StageTimer()
+    if source is not None:
+        _check_source(source)
+    index, parts = _load_bundle(base_output_path)
+
+    name_path = None
+    if name is not None:
+        entry = find_applicant(index, name)
+        name_path = entry['path']
+        affected = sorted({span['part'] - 1 for span in entry['spans']})
+        position = (affected[0], entry['spans'][0]['start'] - 1)
+    else:
+        key = sort_key(source, readings, romaji)
+        titles = {entry['title'] for entry in index['entries']}
+        if os.path.splitext(os.path.basename(source))[0] in titles:
+            raise ValueError(f"{os.path.basename(source)} は既に結合されています (差し替える場合は --replace を指定してください)")
+        following = next((entry for entry in index['entries'] if sort_key(entry['path'], readings, romaji) > key), None)
+        if following is not None:
+            position = (following['spans'][0]['part'] - 1, following['spans'][0]['start'] - 1)
+        else:
+            position = (len(parts) - 1, parts[-1][1])
+        affected = [position[0]]
+
+    new_parts = []
+    removed = []
+    base_name, ext = os.path.splitext(base_output_path)
+    for part_number, part in enumerate(parts):
+        if part_number not in affected:
+            new_parts.append(part)
+            continue
+        rewritten, old_path = _rewrite_part(
+            part, f"{base_name}-{part_number + 1}{ext}", name_path, source,
+            position[1] if part_number == position[0] else None, limit_size, timer,
+        )
+        new_parts.extend(rewritten)
+        if old_path is not None:
+            removed.append(old_path)
+
+    if not new_parts:
+        for path in removed:
+            os.unlink(path)
+        os.unlink(index_path(base_output_path))
+        return []
+
+    output_paths = _rename_parts(base_output_path, new_parts, removed)
+    index = build_index(_global_entries(new_parts), [(path, pages, size) for path, pages, size, _ in new_parts])
+    write_index(index_path(base_output_path), index)
+    return output_paths + [index_path(base_output_path)]
+
+
+def _update_manifest(base_output_path: str, output_paths: list):
+    """
+    結合済みPDFの出力フォルダにマニフェストがあれば、このグループの出力ファイルの一覧を書き換える
+    """
+    output_folder_path = os.path.dirname(os.path.dirname(os.path.abspath(base_output_path)))
+    manifest_path = os.path.join(output_folder_path, MANIFEST_FILE_NAME)
+    if not os.path.isfile(manifest_path):
+        return
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    index_relpath = os.path.relpath(os.path.abspath(index_path(base_output_path)), output_folder_path)
+    for entry in manifest['groups'].values():
+        if index_relpath in entry.get('outputs', []):
+            entry['outputs'] = [os.path.relpath(os.path.abspath(path), output_folder_path) for path in output_paths]
+    save_manifest(manifest, output_folder_path)
+
+
+def run(args):
+    """
+    rebuildサブコマンド: 結合済みのPDFから1人分のページを取り出し・差し替え・削除・追加する
+    """
+    base_output_path = args.bundle
+    # 結合時と同じく、フォルダ名に「履歴書」が含まれる場合は分割しない
+    limit_size = None if "履歴書" in os.path.basename(os.path.dirname(os.path.abspath(base_output_path))) else LIMIT_SIZE
+
+    try:
+        if args.extract:
+            output_pdf_path = args.to or f"{args.extract}.pdf"
+            pages = extract_applicant(base_output_path, args.extract, output_pdf_path)
+            logger.info("%s の%dページを %s に保存しました", args.extract, pages, output_pdf_path)
+            return
+        if args.replace and not args.source:
+            raise ValueError("--replace には --source で差し替えるPDFを指定してください")
+
+        name = args.replace or args.delete
+        source = args.source if args.replace else args.insert
+        readings = load_readings(args.furigana) if args.furigana else None
+        output_paths = rebuild_bundle(base_output_path, name, source, limit_size, readings=readings, romaji=args.romaji)
+    except ValueError as e:
+        logger.error("%s", e)
+        raise SystemExit(1)
+
+    _update_manifest(base_output_path, output_paths)
+    for path in output_paths[:-1]:
+        logger.info("%s", path)
+    logger.info("%s を更新しました (%d件出力)", base_output_path, max(len(output_paths) - 1, 0))
@@ -0,0 +1,175 @@
+import os
+import time
+import logging
+
+import fitz  # PyMuPDF
+from tqdm import tqdm
+
+from hr_assist.bundle_index import source_title
+from hr_assist.classify import classify_files, clean_filename, load_readings, sort_key
+from hr_assist.journal import save_pdf_atomic
+from hr_assist.log_writers import open_log_writer
+from hr_assist.scan import group_by_subfolder, scan_input
+from hr_assist.status_ledger import FileStatus, StatusLedger
+
+# A4と見なす許容誤差(ポイント)
+A4_TOLERANCE = 2
+
+logger = logging.getLogger(__name__)
+
+
+def is_a4(rect) -> bool:
+    """
+    ページが(縦向きの)A4サイズかどうかを許容誤差つきで判定する
+    """
+    a4_width, a4_height = fitz.paper_size("A4")
+    return abs(rect.width - a4_width) <= A4_TOLERANCE and abs(rect.height - a4_height) <= A4_TOLERANCE
+
+
+def append_as_a4(new_doc, src_doc, rasterize_fallback=False):
+    """
+    src_docの各ページをA4のキャンバスにフォームXObjectとして配置しながらnew_docに追加する(ラスタライズしない)
+    もともとA4のページはそのままコピーする
+    rasterize_fallbackを指定した場合のみ、配置に失敗したページを画像化して救済する
+    """
+    a4_width, a4_height = fitz.paper_size("A4")  # A4の幅と高さを取得
+
+    for page_num in range(len(src_doc)):
+        page = src_doc.load_page(page_num)  # 元のページを取得
+        if is_a4(page.rect):
+            new_doc.insert_pdf(src_doc, from_page=page_num, to_page=page_num)
+            continue
+
+        new_page = new_doc.new_page(width=a4_width, height=a4_height)  # A4サイズの新しいページ
+        try:
+            # 縦横比を保ったまま中央に配置される
+            new_page.show_pdf_page(new_page.rect, src_doc, page_num)
+        except Exception as e:
+            if not rasterize_fallback:
+                # 白紙のA4ページを残さない
+                new_doc.delete_page(new_page.number)
+                raise
+            logger.warning("%dページ目をそのまま配置できないため画像化します: %s", page_num + 1, e)
+            rect = page.rect  # ページの元のサイズを取得
+            scale = min(a4_width / rect.width, a4_height / rect.height)  # 縦横比を保つために小さい方を使う
+            pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+            new_page.insert_image(new_page.rect, pixmap=pix)
+
+
+def merge_group_as_a4(subfolder_name: str, row: str, files: list, sub_output_folder_path: str,
+                      rasterize_fallback=False, keep_original=False, progress=None,
+                      readings=None, romaji=False) -> list:
+    """
+    1つの(サブフォルダ, 行)グループの各PDFを1度だけ読み、A4に統一しながら結合して保存する
+    keep_originalを指定した場合のみ、A4変換前の結合PDFも同じ読み込みから書き出す
+    どちらのPDFにもファイルごとのしおりを付ける (A4変換でページ数は変わらない)
+    progressを渡すと、ファイルを1つ処理するごとにその入力バイト数で呼ぶ (進捗バー用)
+    readings/romajiは分類と同じ読みで行内を並べるために sort_key に渡す
+    戻り値はグループ内ファイルの状態レコード
+    """
+    logger.debug("%s/%s に含まれるファイル数: %d", subfolder_name, row, len(files))
+    sorted_files = sorted(files, key=lambda path: sort_key(path, readings, romaji))
+    group_statuses = [FileStatus(f, '結合予定', row) for f in sorted_files]
+
+    a4_doc = fitz.open()
+    original_doc = fitz.open() if keep_original else None
+    toc = []
+    for status in group_statuses:
+        pdf_file = status.path
+        logger.debug("結合中のPDFファイル: %s", pdf_file)
+        started = time.perf_counter()
+        page_start = len(a4_doc)
+        original_start = len(original_doc) if original_doc is not None else 0
+        try:
+            status.bytes_in = os.path.getsize(pdf_file)
+            with fitz.open(pdf_file) as src_doc:
+                status.pages = len(src_doc)
+                append_as_a4(a4_doc, src_doc, rasterize_fallback=rasterize_fallback)
+                if original_doc is not None:
+                    original_doc.insert_pdf(src_doc)
+            status.state = '結合済'
+            toc.append([1, source_title(pdf_file), page_start + 1])
+        except Exception as e:
+            logger.warning("%s の処理中にエラーが発生しました: %s", pdf_file, e)
+            status.state = f'エラー: {e}'
+            # 途中まで追加したこのファイルのページを取り除く
+            if len(a4_doc) > page_start:
+                a4_doc.delete_pages(page_start, len(a4_doc) - 1)
+            if original_doc is not None and len(original_doc) > original_start:
+                original_doc.delete_pages(original_start, len(original_doc) - 1)
+        status.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(status.bytes_in)
+
+    combined_pdf_path = os.path.join(sub_output_folder_path, clean_filename(f"{subfolder_name}_{row}.pdf"))
+    if original_doc is not None:
+        original_doc.set_toc(toc)
+        save_pdf_atomic(original_doc, combined_pdf_path, garbage=4, deflate=True)
+        original_doc.close()
+        logger.debug("%s に保存しました", combined_pdf_path)
+
+    a4_pdf_path = combined_pdf_path.replace(".pdf", "_A4.pdf")
+    a4_doc.set_toc(toc)
+    save_pdf_atomic(a4_doc, a4_pdf_path, garbage=4, deflate=True)
+    a4_doc.close()
+    logger.info("%s のA4サイズ変換が完了しました", a4_pdf_path)
+
+    return group_statuses
+
+
+def run(args):
+    """
+    resizeサブコマンド: 入力フォルダ内のPDFを行ごとに結合しながらA4サイズに統一する
+    """
+    input_folder_path = args.input
+    output_folder_path = args.output
+    output_folder_name = os.path.basename(os.path.normpath(output_folder_path))
+
+    os.makedirs(output_folder_path, exist_ok=True)
+    logger.info("入力フォルダ: %s", input_folder_path)
+    logger.info("出力フォルダ: %s", output_folder_path)
+
+    log_writer = open_log_writer(args.log_format, output_folder_path, clean_filename(f"{output_folder_name}A4ログ"))
+
+    readings = load_readings(args.furigana) if args.furigana else None
+    ledger = StatusLedger()
+
+    # inputフォルダ内のすべてのサブフォルダのPDFを取得
+    scanned = scan_input(input_folder_path, args.depth)
+    subfolders = group_by_subfolder(scanned)
+    logger.info("サブフォルダの数: %d (PDF %d件)", len(subfolders), len(scanned))
+
+    # 進捗はファイルごとに入力バイト数で進める
+    sizes = {scanned_file.path: scanned_file.size for scanned_file in scanned}
+    progress = tqdm(total=sum(sizes.values()), unit='B', unit_scale=True, unit_divisor=1024,
+                    disable=not logger.isEnabledFor(logging.INFO))
+    for subfolder_name, subfolder_files in subfolders.items():
+        logger.debug("現在処理中のサブフォルダ: %s", subfolder_name)
+
+        # サブフォルダ専用の出力フォルダを作成
+        sub_output_folder_path = os.path.join(output_folder_path, clean_filename(subfolder_name))
+        os.makedirs(sub_output_folder_path, exist_ok=True)
+
+        subfolder_ledger = StatusLedger()
+        file_groups = classify_files([f.path for f in subfolder_files], subfolder_ledger, readings, args.romaji)
+        ledger.extend(subfolder_ledger)
+        log_writer.write_rows([status.to_record() for status in subfolder_ledger if status.row == 'なし'])
+
+        for row, files in file_groups.items():
+            if files:
+                group_statuses = merge_group_as_a4(
+                    subfolder_name, row, files, sub_output_folder_path,
+                    rasterize_fallback=args.rasterize_fallback, keep_original=args.keep_original,
+                    progress=progress.update, readings=readings, romaji=args.romaji,
+                )
+                ledger.apply(group_statuses)
+                log_writer.write_rows([status.to_record() for status in group_statuses])
+        # 50音順に対応しないファイルも進捗に含める
+        progress.update(sum(sizes[status.path] for status in subfolder_ledger if status.row == 'なし'))
+    progress.close()
+
+    logger.info("ファイルの結合とA4サイズへの変換が完了しました。")
+
+    log_writer.close(ledger.to_records())
+    logger.info("ログファイルが %s に%s形式で出力されました。", log_writer.path, log_writer.label)
+
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ScannedFile:
+    """
+    入力フォルダで見つかったPDF1件 (subfolderは入力フォルダ直下のサブフォルダ名)
+    """
+    subfolder: str
+    path: str
+    size: int
+    mtime: float
+
+
+def is_pdf(file_name: str) -> bool:
+    """
+    拡張子がPDFか (大文字の .PDF も含む)
+    """
+    return file_name.lower().endswith('.pdf')
+
+
+def _scan_folder(subfolder_name: str, folder_path: str, depth: int) -> list:
+    """
+    folder_path以下のPDFを、depth階層下のフォルダまで再帰的に集める
+    DirEntryの種別とstatを使い、エントリごとのisdir/getsizeの往復を避ける
+    """
+    found = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if depth > 1:
+                    found.extend(_scan_folder(subfolder_name, entry.path, depth - 1))
+            elif entry.is_file() and is_pdf(entry.name):
+                stat = entry.stat()
+                found.append(ScannedFile(subfolder_name, entry.path, stat.st_size, stat.st_mtime))
+    return found
+
+
+def scan_input(input_folder_path: str, depth: int = 1, threads: int = 4) -> list:
+    """
+    入力フォルダ直下の各サブフォルダからPDFを集め、(サブフォルダ名, パス)順に並べた1つのリストを返す
+    depthはサブフォルダから何階層下まで探すか (1ならサブフォルダ直下のみ)
+    ネットワーク共有の往復を重ねるため、サブフォルダごとの走査はthreads個のスレッドで並列に行う
+    """
+    with os.scandir(input_folder_path) as entries:
+        subfolders = [(entry.name, entry.path) for entry in entries if entry.is_dir()]
+
+    if threads > 0:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda subfolder: _scan_folder(*subfolder, depth), subfolders))
+    else:
+        results = [_scan_folder(*subfolder, depth) for subfolder in subfolders]
+
+    scanned = [scanned_file for result in results for scanned_file in result]
+    scanned.sort(key=lambda scanned_file: (scanned_file.subfolder, scanned_file.path))
+    return scanned
+
+
+def group_by_subfolder(scanned: list) -> dict:
+    """
+    走査結果をサブフォルダ名ごとのリストにまとめる (並び順は保つ)
+    """
+    groups = {}
+    for scanned_file in scanned:
+        groups.setdefault(scanned_file.subfolder, []).append(scanned_file)
+    return groups
@@ -0,0 +1,39 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# 1ページあたりの処理(挿入・見積もり・重複除去)をバイト数に換算した値 (投入順の見積もり用)
+PAGE_WORK_BYTES = 32 * 1024
+
+# 結合中のメモリ使用量の見積もり (入力バイト数に対する倍率)
+# 先読みした入力・結合中のドキュメント・保存時のバッファがそれぞれ入力と同程度になる
+MEMORY_FACTOR = 3
+
+
+def schedule_jobs(jobs: list, cost, submit, max_workers: int, memory_budget: int = 0, memory=None):
+    """
+    jobsを大きい順(LPT: 処理時間の長いものから)に投入し、完了した順に (job, future) を返すジェネレータ
+    costはjobの処理量(入力バイト数等)を返す関数、submitはjobを投入してFutureを返す関数
+    memoryはjobの入力バイト数を返す関数 (省略時はcost)
+    同時に実行するのはmax_workers件までで、見積もりメモリ(memory × MEMORY_FACTOR)の合計が
+    memory_budgetを超える場合は、実行中のjobが終わるまで次の投入を待つ (0なら無制限)
+    予算を1件で超えるjobも、他に実行中のものがなければ投入する
+    """
+    if memory is None:
+        memory = cost
+    pending = deque(sorted(jobs, key=cost, reverse=True))
+    running = {}
+    in_use = 0
+    while pending or running:
+        while pending and len(running) < max_workers:
+            job_memory = memory(pending[0]) * MEMORY_FACTOR
+            if running and memory_budget and in_use + job_memory > memory_budget:
+                break
+            job = pending.popleft()
+            running[submit(job)] = (job, job_memory)
+            in_use += job_memory
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            job, job_memory = running.pop(future)
+            in_use -= job_memory
+            yield job, future
@@ -0,0 +1,343 @@
+import os
+import re
+import hashlib
+import logging
+
+import fitz  # PyMuPDF
+
+from hr_assist.bundle_index import INDEX_SUFFIX, build_index, index_path, part_toc, write_index
+from hr_assist.dedup import dedup_streams
+from hr_assist.profiling import StageTimer
+
+
+# 1ページあたりの辞書・xref等のオーバーヘッド概算(バイト)
+PAGE_OVERHEAD = 512
+
+logger = logging.getLogger(__name__)
+
+
+def _ref_xref(value: str) -> int:
+    """
+    '12 0 R' や '[12 0 R]' 形式の参照からxref番号を取り出す
+    """
+    parts = value.strip("[] \n").split()
+    if len(parts) >= 3 and parts[2] == "R":
+        return int(parts[0])
+    return 0
+
+
+def _stream_raw(doc, xref: int) -> bytes:
+    """
+    xrefが指すストリームの(圧縮済み)バイト列を返す (ストリームでなければ空)
+    """
+    if xref <= 0 or not doc.xref_is_stream(xref):
+        return b''
+    return doc.xref_stream_raw(xref) or b''
+
+
+def _stream_size(doc, xref: int) -> int:
+    """
+    xrefが指すストリームの(圧縮済み)バイト数を返す
+    """
+    return len(_stream_raw(doc, xref))
+
+
+def _font_files(doc, xref: int) -> list:
+    """
+    フォント辞書から埋め込みフォントファイルのxrefを求める
+    """
+    kind, value = doc.xref_get_key(xref, "DescendantFonts")
+    if kind == "xref":
+        value = doc.xref_object(_ref_xref(value))
+    if kind in ("array", "xref") and _ref_xref(value):
+        xref = _ref_xref(value)
+
+    kind, value = doc.xref_get_key(xref, "FontDescriptor")
+    if kind != "xref":
+        return []
+    descriptor = _ref_xref(value)
+    files = []
+    for key in ("FontFile", "FontFile2", "FontFile3"):
+        kind, value = doc.xref_get_key(descriptor, key)
+        if kind == "xref":
+            files.append(_ref_xref(value))
+    return files
+
+
+def _shared_cost(doc, xrefs: list) -> tuple:
+    """
+    共有オブジェクトを構成するストリームから (内容のハッシュ, バイト数) を返す
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for xref in xrefs:
+        raw = _stream_raw(doc, xref)
+        digest.update(len(raw).to_bytes(8, 'little'))
+        digest.update(raw)
+        size += len(raw)
+    return digest.hexdigest()[:32], size
+
+
+def estimate_page_costs(doc) -> list:
+    """
+    各ページのバイトコストを1度だけ見積もる
+    戻り値は [(ページ固有のバイト数, {共有オブジェクトの内容のハッシュ: バイト数}), ...]
+    画像・フォント・XObjectは複数ページで共有されうるため別に持つ
+    共有オブジェクトは内容のハッシュで区別するため、別のソースPDFに含まれる同じロゴ等も
+    (保存時の garbage=4 と重複除去でまとまるのと同じく) パートごとに1回だけ数えられる
+    """
+    costs = []
+    keys = {}  # xref -> (内容のハッシュ, バイト数)  (複数ページで使われるものは1度だけ読む)
+
+    def shared_cost(xref, xrefs):
+        if xref not in keys:
+            keys[xref] = _shared_cost(doc, xrefs)
+        return keys[xref]
+
+    for page in doc:
+        own = PAGE_OVERHEAD + sum(_stream_size(doc, xref) for xref in page.get_contents())
+        shared = {}
+        for img in page.get_images(full=True):
+            key, size = shared_cost(img[0], [img[0], img[1]])
+            shared[key] = size
+        for font in page.get_fonts(full=True):
+            if font[0] > 0:
+                key, size = shared_cost(font[0], _font_files(doc, font[0]))
+                shared[key] = size
+        for xobj in page.get_xobjects():
+            key, size = shared_cost(xobj[0], [xobj[0]])
+            shared[key] = size
+        costs.append((own, shared))
+    return costs
+
+
+def _pack_pages(costs: list, page_start: int, limit_size: int) -> int:
+    """
+    page_startから貪欲にページを詰め、limit_sizeに収まる終端(排他)を返す
+    共有オブジェクトはパートごとに1回だけ数える
+    """
+    seen = set()
+    total = 0
+    page_end = page_start
+    while page_end < len(costs):
+        own, shared = costs[page_end]
+        cost = own + sum(size for key, size in shared.items() if key not in seen)
+        if page_end > page_start and total + cost > limit_size:
+            break
+        total += cost
+        seen.update(shared)
+        page_end += 1
+    return page_end
+
+
+def _save_part(reader, page_start: int, page_end: int, path: str, timer: StageTimer, toc=None) -> int:
+    """
+    page_start〜page_end(排他)をpathに保存し、保存後のサイズを返す
+    tocを渡すと toc(page_start, page_end) の目次をしおりとして付ける
+    """
+    with timer.measure('分割保存') as measurement:
+        part_doc = fitz.open()
+        part_doc.insert_pdf(reader, from_page=page_start, to_page=page_end - 1)
+        if toc is not None:
+            part_doc.set_toc(toc(page_start, page_end))
+        part_doc.save(path, garbage=4, deflate=True)
+        part_doc.close()
+        measurement.bytes_out = os.path.getsize(path)
+    return measurement.bytes_out
+
+
+def _bisect_part(reader, page_start: int, page_end: int, path: str, limit_size: int, timer: StageTimer, toc=None):
+    """
+    見積もりが外れて保存サイズが超過した場合のみ、収まる最大のページ数を二分探索する
+    1ページだけの場合は超過していてもそのまま採用する (tocは_save_partを参照)
+    """
+    low, high = page_start + 1, page_end - 1
+    saved_end = page_end
+    size = 0
+    while low < high:
+        mid = (low + high + 1) // 2
+        size = _save_part(reader, page_start, mid, path, timer, toc)
+        saved_end = mid
+        if size <= limit_size:
+            low = mid
+        else:
+            high = mid - 1
+    if saved_end != low:
+        size = _save_part(reader, page_start, low, path, timer, toc)
+    return low, size
+
+
+def remove_group_outputs(base_output_path: str):
+    """
+    グループを結合し直す前に、以前の実行で出力したこのグループのファイル(分割なし・分割パーツ)を削除する
+    中断したグループの一部のパーツだけが残ったり、パーツ数が減ったときに古いパーツが残ったりしないようにする
+    パーツの索引ファイルも削除する
+    """
+    folder = os.path.dirname(base_output_path)
+    base_name, ext = os.path.splitext(os.path.basename(base_output_path))
+    pattern = re.compile(re.escape(base_name) + r'((-\d+)?' + re.escape(ext) + '|' + re.escape(INDEX_SUFFIX) + ')')
+    for file_name in os.listdir(folder):
+        if pattern.fullmatch(file_name):
+            os.unlink(os.path.join(folder, file_name))
+
+
+def split_document(doc, base_output_path: str, limit_size: int, timer=None, costs=None, toc=None) -> list:
+    """
+    開いているdocをlimit_sizeごとのパートに分けて一時ファイル {base}_temp_{n} に保存する
+    costsにestimate_page_costsの結果があれば見積もりを省く。tocは_save_partを参照
+    戻り値は [(一時ファイルのパス, ページ数, バイト数), ...] (リネームは呼び出し側で行う)
+    """
+    if timer is None:
+        timer = StageTimer()
+    if costs is None:
+        with timer.measure('分割見積もり'):
+            costs = estimate_page_costs(doc)
+    base_name, ext = os.path.splitext(base_output_path)
+
+    parts = []
+    page_start = 0
+    while page_start < len(doc):
+        # 手動で一時ファイルを生成して保存 (この保存がサイズ確認を兼ねる)
+        temp_file_name = f"{base_name}_temp_{len(parts) + 1}{ext}"
+        page_end = _pack_pages(costs, page_start, limit_size)
+        current_size = _save_part(doc, page_start, page_end, temp_file_name, timer, toc)
+
+        if current_size > limit_size and page_end - page_start > 1:
+            page_end, current_size = _bisect_part(doc, page_start, page_end, temp_file_name, limit_size, timer, toc)
+        parts.append((temp_file_name, page_end - page_start, current_size))
+        page_start = page_end
+    return parts
+
+
+class PartWriter:
+    """
+    ソースPDFを受け取るたびにページ単位で現在のパートへ追記し、見積もりがlimit_sizeを超える直前で
+    パートを保存して次のパートを始める (結合と分割を1回の走査で行い、メモリ上には現在のパートだけを持つ)
+    limit_sizeがNoneなら分割しない (履歴書)
+    パートは一時ファイルに保存し、closeで1パートなら base_output_path、複数なら {base}-{n} にリネームする
+    各パートにはソースごとのしおりを付け、closeでソースごとのパートとページ範囲の索引 ({base}_索引.json) を書き出す
+    """
+
+    def __init__(self, base_output_path: str, limit_size=9*(1024*1024), timer=None):
+        self.base_output_path = base_output_path
+        self.base_name, self.ext = os.path.splitext(base_output_path)
+        self.limit_size = limit_size
+        self.timer = timer if timer is not None else StageTimer()
+        self.parts = []  # (一時ファイルのパス, ページ数, バイト数)
+        self.saved_bytes = 0  # 重複除去で削減したバイト数
+        self.entries = []  # [ソースのパス, 通しの開始ページ, 通しの終了ページ(排他)]
+        self.total_pages = 0  # 追記した通しのページ数
+        self.part_offset = 0  # 現在のパートの先頭ページの通し番号
+        self.index_path = None
+        self._new_part()
+
+    def _new_part(self, doc=None):
+        self.part = doc if doc is not None else fitz.open()
+        self.part_cost = 0
+        self.part_shared = set()
+
+    def append(self, src_doc, costs=None, source=''):
+        """
+        src_docの全ページを追記する。costsにestimate_page_costsの結果があれば見積もりを省く
+        sourceはしおりと索引に使うソースのパス
+        ページの見積もりを足すと上限を超える場合は、そのページの手前までを現在のパートとして保存する
+        連続するページはまとめて挿入する
+        """
+        if costs is None:
+            with self.timer.measure('分割見積もり'):
+                costs = estimate_page_costs(src_doc)
+        self.entries.append([source, self.total_pages, self.total_pages])
+        page_start = 0
+        for page_num, (own, shared) in enumerate(costs):
+            # 共有オブジェクトは内容のハッシュで区別し、ソースをまたいでもパート内で1回だけ数える
+            cost = own + sum(size for key, size in shared.items() if key not in self.part_shared)
+            pending_pages = len(self.part) + page_num - page_start
+            if self.limit_size is not None and pending_pages and self.part_cost + cost > self.limit_size:
+                self._insert(src_doc, page_start, page_num)
+                page_start = page_num
+                self._flush()
+                cost = own + sum(size for key, size in shared.items() if key not in self.part_shared)
+            self.part_cost += cost
+            self.part_shared.update(shared)
+        self._insert(src_doc, page_start, len(costs))
+
+    def _insert(self, src_doc, page_start: int, page_end: int):
+        if page_end > page_start:
+            with self.timer.measure('挿入'):
+                self.part.insert_pdf(src_doc, from_page=page_start, to_page=page_end - 1)
+            self.total_pages += page_end - page_start
+            self.entries[-1][2] = self.total_pages
+
+    def _toc(self, page_start: int, page_end: int) -> list:
+        """
+        現在のパートのpage_start〜page_end(排他)を保存するときの目次
+        """
+        return part_toc(self.entries, self.part_offset + page_start, self.part_offset + page_end)
+
+    def _flush(self, final=False):
+        """
+        現在のパートを重複除去して保存する
+        見積もりが外れて保存サイズが超過した場合は、収まるページ数を二分探索し、残りのページを次のパートに繰り越す
+        final でなければ、繰り越したページが上限に収まる限りそのパートへの追記を続ける
+        """
+        while len(self.part):
+            path = f"{self.base_name}_temp_{len(self.parts) + 1}{self.ext}"
+            with self.timer.measure('重複除去') as measurement:
+                measurement.bytes_in, saved_bytes = dedup_streams(self.part)
+                measurement.bytes_out = measurement.bytes_in - saved_bytes
+            self.saved_bytes += saved_bytes
+            pages = len(self.part)
+            with self.timer.measure('パート保存') as measurement:
+                self.part.set_toc(self._toc(0, pages))
+                self.part.save(path, garbage=4, deflate=True)
+                measurement.bytes_out = size = os.path.getsize(path)
+
+            if self.limit_size is None or size <= self.limit_size or pages == 1:
+                self.parts.append((path, pages, size))
+                self.part_offset += pages
+                self.part.close()
+                self._new_part()
+                return
+
+            page_end, size = _bisect_part(self.part, 0, pages, path, self.limit_size, self.timer, self._toc)
+            self.parts.append((path, page_end, size))
+            self.part_offset += page_end
+            carry = fitz.open()
+            carry.insert_pdf(self.part, from_page=page_end, to_page=pages - 1)
+            self.part.close()
+            self._new_part(carry)
+            with self.timer.measure('分割見積もり'):
+                for own, shared in estimate_page_costs(carry):
+                    self.part_cost += own + sum(size for key, size in shared.items() if key not in self.part_shared)
+                    self.part_shared.update(shared)
+            if not final and self.part_cost <= self.limit_size:
+                return
+
+    def close(self) -> list:
+        """
+        残りのページを保存し、一時ファイルを出力ファイル名にリネームして索引を書き出す
+        戻り値は出力したファイルパスのリスト (最後が索引ファイル)
+        """
+        self._flush(final=True)
+        self.part.close()
+
+        if not self.parts:
+            return []
+        if len(self.parts) == 1:
+            os.replace(self.parts[0][0], self.base_output_path)
+            output_paths = [self.base_output_path]
+            logger.debug("%s の結合が完了しました (分割不要)", self.base_output_path)
+        else:
+            output_paths = []
+            for part_number, (temp_path, pages, size) in enumerate(self.parts, 1):
+                output_part_path = f"{self.base_name}-{part_number}{self.ext}"
+                os.replace(temp_path, output_part_path)
+                output_paths.append(output_part_path)
+                logger.debug("%s に分割保存しました (%dページ, 約%.2fMB)", output_part_path, pages, size / 1024 / 1024)
+            logger.debug("%s の分割が完了しました", self.base_output_path)
+
+        # 索引は追記時に数えたページ数から作るため、出力したPDFを開き直さない
+        self.index_path = index_path(self.base_output_path)
+        parts = [(path, pages, size) for path, (_, pages, size) in zip(output_paths, self.parts)]
+        write_index(self.index_path, build_index(self.entries, parts))
+        return output_paths + [self.index_path]
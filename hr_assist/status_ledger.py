@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class FileStatus:
+    """
+    1ファイル分の処理状態
+    """
+    path: str
+    state: str = '未結合'
+    row: str = 'なし'
+    seconds: float = 0.0
+    bytes_in: int = 0
+    pages: int = 0
+
+    def to_record(self) -> dict:
+        """
+        ログ出力用の辞書に変換する
+        """
+        return {
+            'ファイルパス': self.path,
+            '状態': self.state,
+            '分類': self.row,
+            '処理時間(秒)': round(self.seconds, 3),
+            '入力バイト数': self.bytes_in,
+            'ページ数': self.pages,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "FileStatus":
+        """
+        to_recordで作った辞書から復元する
+        """
+        return cls(
+            path=record['ファイルパス'],
+            state=record['状態'],
+            row=record['分類'],
+            seconds=record.get('処理時間(秒)', 0.0),
+            bytes_in=record.get('入力バイト数', 0),
+            pages=record.get('ページ数', 0),
+        )
+
+
+class StatusLedger:
+    """
+    ファイルパスをキーにした状態台帳
+    更新はO(1)で、ログの並びは登録順のまま保たれる
+    """
+
+    def __init__(self):
+        self._statuses = {}
+
+    def add(self, path: str, state: str = '未結合', row: str = 'なし') -> FileStatus:
+        status = FileStatus(path, state, row)
+        self._statuses[path] = status
+        return status
+
+    def update(self, path: str, **fields):
+        status = self._statuses[path]
+        for name, value in fields.items():
+            setattr(status, name, value)
+
+    def apply(self, statuses):
+        """
+        ワーカー等から返された状態で登録済みのレコードを置き換える (並び順は変えない)
+        """
+        for status in statuses:
+            self._statuses[status.path] = status
+
+    def extend(self, other: "StatusLedger"):
+        self._statuses.update(other._statuses)
+
+    def __getitem__(self, path: str) -> FileStatus:
+        return self._statuses[path]
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._statuses
+
+    def __iter__(self):
+        return iter(self._statuses.values())
+
+    def __len__(self) -> int:
+        return len(self._statuses)
+
+    def to_records(self) -> list:
+        return [status.to_record() for status in self._statuses.values()]
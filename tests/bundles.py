@@ -0,0 +1,72 @@
+import os
+import random
+
+import fitz  # PyMuPDF
+
+from hr_assist.bundle_index import INDEX_SUFFIX, load_index
+from hr_assist.split import PartWriter
+
+# 1ページあたり約60KB (乱数の画像は圧縮できない)
+IMAGE_SIDE = 140
+
+
+def make_source(path: str, pages: int, seed: int) -> str:
+    """
+    乱数の画像を1ページに1枚ずつ貼り、「seed:ページ番号」の文字を書いたPDFを作る
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        samples = bytes(rng.randrange(256) for _ in range(IMAGE_SIDE * IMAGE_SIDE * 3))
+        page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, IMAGE_SIDE, IMAGE_SIDE, samples, False))
+        page.insert_text((50, 50), f"{seed}:{number}")
+    doc.save(path, garbage=4, deflate=True)
+    doc.close()
+    return path
+
+
+def make_sources(folder, counts: list) -> list:
+    return [make_source(os.path.join(folder, f"ア{n:02d}.pdf"), pages, n) for n, pages in enumerate(counts)]
+
+
+def write_bundle(sources: list, base_output_path: str, limit_size, costs=None) -> list:
+    """
+    sourcesを順にPartWriterに追記する (costsにはページの見積もりを返す関数を渡せる)
+    """
+    writer = PartWriter(base_output_path, limit_size)
+    for source in sources:
+        with fitz.open(source) as doc:
+            writer.append(doc, costs(doc) if costs else None, source)
+    return writer.close()
+
+
+def check_bundle(output_paths: list, sources: list, limit_size):
+    """
+    パートのサイズ・ページ数・しおりが索引と一致し、索引のページ範囲が各ソースのページと一致するか
+    """
+    *parts, index_file = output_paths
+    assert index_file.endswith(INDEX_SUFFIX)
+    index = load_index(index_file)
+    assert [os.path.basename(path) for path in parts] == [part['file'] for part in index['parts']]
+
+    for number, (path, part) in enumerate(zip(parts, index['parts']), 1):
+        with fitz.open(path) as doc:
+            assert len(doc) == part['pages']
+            assert os.path.getsize(path) == part['bytes']
+            if limit_size is not None:
+                assert part['bytes'] <= limit_size or part['pages'] == 1
+            bookmarks = [[1, entry['title'], span['start']]
+                         for entry in index['entries'] for span in entry['spans'] if span['part'] == number]
+            assert doc.get_toc() == bookmarks
+
+    assert [entry['path'] for entry in index['entries']] == sources
+    for entry, source in zip(index['entries'], sources):
+        with fitz.open(source) as doc:
+            expected = [page.get_text() for page in doc]
+        assert entry['end'] - entry['start'] + 1 == len(expected)
+        labels = []
+        for span in entry['spans']:
+            with fitz.open(parts[span['part'] - 1]) as doc:
+                labels += [doc[page].get_text() for page in range(span['start'] - 1, span['end'])]
+        assert labels == expected
@@ -0,0 +1,96 @@
+import pytest
+
+from hr_assist.classify import ROW_INDEX, collation_key, resolve_row, romaji_to_katakana, sort_key
+
+
+@pytest.mark.parametrize('char, row', [
+    ('あ', 'ア行'), ('ア', 'ア行'), ('ｱ', 'ア行'),
+    ('が', 'カ行'), ('ガ', 'カ行'), ('ヶ', 'カ行'), ('ゖ', 'カ行'),
+    ('ぱ', 'ハ行'), ('ポ', 'ハ行'), ('ば', 'ハ行'),
+    ('ゔ', 'ア行'), ('ヴ', 'ア行'), ('ぁ', 'ア行'),
+    ('っ', 'タ行'), ('ヅ', 'タ行'),
+    ('ゃ', 'ヤ行'), ('ｮ', 'ヤ行'),
+    ('ゎ', 'ワ行'), ('ゐ', 'ワ行'), ('ヱ', 'ワ行'), ('ヲ', 'ワ行'), ('ｦ', 'ワ行'), ('ン', 'ワ行'), ('ﾝ', 'ワ行'),
+])
+def test_row_index(char, row):
+    assert ROW_INDEX[char] == row
+
+
+@pytest.mark.parametrize('char', ['ー', 'ｰ', '・', 'ﾞ', '青', 'A'])
+def test_row_index_excludes_non_kana(char):
+    assert char not in ROW_INDEX
+
+
+@pytest.mark.parametrize('file_name, row', [
+    ('あおき.pdf', 'ア行'),
+    ('ｶﾞﾄｳ.pdf', 'カ行'),  # 半角の濁点は結合してから引く
+    ('ﾊﾟｸ.PDF', 'ハ行'),
+    ('ゐのうえ.pdf', 'ワ行'),
+    ('ンジャイ.pdf', 'ワ行'),
+    ('ーアオキ.pdf', None),
+    ('青木.pdf', None),
+    ('Aoki.pdf', None),
+])
+def test_resolve_row(file_name, row):
+    assert resolve_row(file_name) == row
+
+
+@pytest.mark.parametrize('file_name, readings, romaji, row', [
+    ('青木.pdf', {'青木': 'アオキ'}, False, 'ア行'),
+    ('青木.pdf', {'青木.pdf': 'あおき'}, False, 'ア行'),
+    ('後藤.pdf', {'後藤': 'ｺﾞﾄｳ'}, False, 'カ行'),
+    ('青木.pdf', {'佐藤': 'サトウ'}, False, None),
+    ('Aoki.pdf', None, True, 'ア行'),
+    ('Ｓａｔｏ.pdf', None, True, 'サ行'),  # 全角英字
+    ('Chen.pdf', None, True, 'タ行'),
+    ('Kato.pdf', {'Kato': 'サトウ'}, True, 'サ行'),  # フリガナが先
+    ('さとう.pdf', {'さとう': 'アオキ'}, True, 'サ行'),  # 仮名で始まる名前はそのまま
+    ('123.pdf', None, True, None),
+])
+def test_resolve_row_fallbacks(file_name, readings, romaji, row):
+    assert resolve_row(file_name, readings, romaji) == row
+
+
+@pytest.mark.parametrize('ordered', [
+    ['はな', 'ばな', 'ぱな'],  # 清音 < 濁音 < 半濁音
+    ['キャク', 'キヤク'],  # 小書き < 通常
+    ['あき', 'アキ'],  # ひらがな < カタカナ
+    ['カア', 'カー', 'カイ'],  # 長音符は直前の母音として並ぶ
+    ['コーヒー', 'コーラ', 'コオリ'],  # コオヒイ < コオラ < コオリ
+    ['アオキ', 'イトウ', 'ウエダ', 'ワタナベ', 'ヰノウエ'],
+])
+def test_collation_order(ordered):
+    assert sorted(reversed(ordered), key=collation_key) == ordered
+
+
+@pytest.mark.parametrize('half, full', [('ｱｵｷ', 'アオキ'), ('ｶﾞﾄｳ', 'ガトウ'), ('ﾊﾟｸ', 'パク'), ('ｷｬﾛﾙ', 'キャロル')])
+def test_half_width_collates_as_full_width(half, full):
+    assert collation_key(half) == collation_key(full)
+
+
+@pytest.mark.parametrize('text, reading', [
+    ('Sakamoto', 'サカモト'),
+    ('Honda', 'ホンダ'),
+    ('Kanna', 'カンナ'),
+    ("Shin'ichi", 'シンイチ'),
+    ('Hattori', 'ハットリ'),
+    ('Matcha', 'マッチャ'),
+    ('Kōno', 'コノ'),
+    ('Ryōko', 'リョコ'),
+    ('Tsujimura', 'ツジムラ'),
+])
+def test_romaji_to_katakana(text, reading):
+    assert romaji_to_katakana(text) == reading
+
+
+def test_sort_key_uses_furigana():
+    files = ['in/ウエダ.pdf', 'in/青木.pdf', 'in/伊藤.pdf', 'in/アベ.pdf']
+    readings = {'青木': 'アオキ', '伊藤.pdf': 'イトウ'}
+    assert sorted(files, key=lambda path: sort_key(path, readings)) == \
+        ['in/青木.pdf', 'in/アベ.pdf', 'in/伊藤.pdf', 'in/ウエダ.pdf']
+
+
+def test_sort_key_uses_romaji():
+    files = ['in/ウエダ.pdf', 'in/Inoue.pdf', 'in/アベ.pdf', 'in/Aoki.pdf']
+    assert sorted(files, key=lambda path: sort_key(path, romaji=True)) == \
+        ['in/Aoki.pdf', 'in/アベ.pdf', 'in/Inoue.pdf', 'in/ウエダ.pdf']
@@ -0,0 +1,66 @@
+import zlib
+
+import fitz  # PyMuPDF
+
+from hr_assist.dedup import dedup_streams
+
+
+def _logo() -> fitz.Pixmap:
+    """
+    透過(SMask)つきの小さなロゴ画像
+    """
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 200), True)
+    pix.set_rect(pix.irect, (20, 90, 160, 255))
+    for x in range(0, 200, 3):
+        for y in range(0, 200, 5):
+            pix.set_pixel(x, y, ((x * 7) % 256, (y * 13) % 256, (x * y) % 256, (x + y) % 256))
+    return pix
+
+
+def _source(pix: fitz.Pixmap, level: int) -> bytes:
+    """
+    ロゴを1つ貼ったPDF (画像とSMaskを圧縮率levelのFlateで保存する)
+    """
+    doc = fitz.open()
+    page = doc.new_page()
+    xref = page.insert_image(page.rect, pixmap=pix)
+    for image_xref in (xref, int(doc.xref_get_key(xref, 'SMask')[1].split()[0])):
+        data = doc.xref_stream(image_xref)
+        doc.update_stream(image_xref, zlib.compress(data, level), compress=False)
+        doc.xref_set_key(image_xref, 'Filter', '/FlateDecode')
+    return doc.tobytes()
+
+
+def _merged(sources: list):
+    merged = fitz.open()
+    for data in sources:
+        with fitz.open(stream=data, filetype='pdf') as src_doc:
+            merged.insert_pdf(src_doc)
+    return merged
+
+
+def _saved_size(doc) -> int:
+    return len(doc.tobytes(garbage=4, deflate=True))
+
+
+def test_identical_streams_are_left_to_garbage():
+    # バイト列まで同じ重複は garbage=4 でもまとまるため、削減量に数えない
+    pix = _logo()
+    sources = [_source(pix, 9), _source(pix, 9)]
+    doc = _merged(sources)
+    _, saved_bytes = dedup_streams(doc)
+    assert saved_bytes == 0
+    assert _saved_size(doc) == _saved_size(_merged(sources))
+
+
+def test_recompressed_images_are_merged():
+    # 圧縮率だけが違う同じロゴは garbage=4 ではまとまらず、展開後の内容で比べるとまとまる
+    pix = _logo()
+    sources = [_source(pix, 9), _source(pix, 1)]
+    doc = _merged(sources)
+    _, saved_bytes = dedup_streams(doc)
+    actual = _saved_size(_merged(sources)) - _saved_size(doc)
+    assert saved_bytes > 0
+    # 数えるのはストリーム本体だけなので、実際の削減量(辞書を含む)とほぼ一致する
+    assert 0.9 * actual <= saved_bytes <= actual
+    assert [page.get_pixmap().samples for page in doc] == [page.get_pixmap().samples for page in _merged(sources)]
@@ -0,0 +1,53 @@
+import os
+import sys
+import subprocess
+
+# python -m hr_assist --help で読み込んでよい時間の上限 (READMEの目安)
+IMPORT_BUDGET_US = 50 * 1000
+
+# サブコマンドの実行時まで読み込まない重い依存関係
+HEAVY_MODULES = ('fitz', 'pymupdf', 'pandas', 'tqdm')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_times(args=('--help',), cwd=REPO_ROOT) -> list:
+    """
+    python -X importtime -m hr_assist {args} の出力を (モジュール名, 累計時間(us), 階層) のリストにする
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'hr_assist', *args],
+        cwd=cwd, capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': REPO_ROOT},
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+
+def test_help_does_not_import_heavy_modules():
+    names = {name for name, _, _ in _import_times()}
+    loaded = sorted(name for name in names if name.split('.')[0] in HEAVY_MODULES)
+    assert not loaded, f"--help で重い依存関係が読み込まれています: {loaded}"
+
+
+def test_dry_run_does_not_import_heavy_modules(tmp_path):
+    # ドライランはログを出力するだけなので、tqdm (進捗バー) も読み込まない
+    (tmp_path / "input" / "営業部").mkdir(parents=True)
+    (tmp_path / "input" / "営業部" / "アオキ.pdf").write_bytes(b"%PDF-1.4\n")
+    args = ('combine', '--dry-run', '--input', 'input', '--output', 'output')
+    names = {name for name, _, _ in _import_times(args, tmp_path)}
+    loaded = sorted(name for name in names if name.split('.')[0] in HEAVY_MODULES)
+    assert not loaded, f"ドライランで重い依存関係が読み込まれています: {loaded}"
+    assert not (tmp_path / "output").exists()
+
+
+def test_help_import_budget():
+    # 最上位で読み込んだ hr_assist のモジュール (その下の依存を含む累計) の合計
+    total = sum(cumulative for name, cumulative, depth in _import_times() if depth == 0 and name.startswith('hr_assist'))
+    assert total <= IMPORT_BUDGET_US, f"hr_assistの読み込みに{total / 1000:.1f}msかかっています (上限 {IMPORT_BUDGET_US / 1000:.0f}ms)"
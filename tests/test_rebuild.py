@@ -0,0 +1,91 @@
+import os
+
+from bundles import check_bundle, make_source, make_sources, write_bundle
+
+from hr_assist.bundle_index import load_index
+from hr_assist.rebuild import rebuild_bundle
+
+LIMIT = 300 * 1024
+
+
+def _bundle(tmp_path, counts: list) -> tuple:
+    """
+    結合済みの出力を作り、前回の出力フォルダにハードリンクで共有した状態にする
+    戻り値は (ソースのリスト, 番号なしの出力パス, 前回の出力ファイル -> 内容)
+    """
+    input_folder = tmp_path / "input"
+    output_folder = tmp_path / "output"
+    previous_folder = tmp_path / "previous"
+    for folder in (input_folder, output_folder, previous_folder):
+        folder.mkdir()
+    sources = make_sources(input_folder, counts)
+    base_output_path = str(output_folder / "部_ア行.pdf")
+    previous = {}
+    for path in write_bundle(sources, base_output_path, LIMIT):
+        linked = str(previous_folder / os.path.basename(path))
+        os.link(path, linked)
+        with open(linked, 'rb') as f:
+            previous[linked] = f.read()
+    return sources, base_output_path, previous
+
+
+def _check_previous(previous: dict):
+    """
+    前回の出力フォルダのファイルが書き換わっていないか
+    """
+    for path, data in previous.items():
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+
+def _parts(base_output_path: str) -> list:
+    return load_index(f"{os.path.splitext(base_output_path)[0]}_索引.json")['parts']
+
+
+def _spans(base_output_path: str, title: str) -> list:
+    index = load_index(f"{os.path.splitext(base_output_path)[0]}_索引.json")
+    return next(entry['spans'] for entry in index['entries'] if entry['title'] == title)
+
+
+def test_delete(tmp_path):
+    sources, base_output_path, previous = _bundle(tmp_path, [3, 5, 2, 4, 6])
+    output_paths = rebuild_bundle(base_output_path, name='ア02', limit_size=LIMIT)
+    check_bundle(output_paths, sources[:2] + sources[3:], LIMIT)
+    _check_previous(previous)
+
+
+def test_replace_across_part_boundary(tmp_path):
+    sources, base_output_path, previous = _bundle(tmp_path, [3, 5, 2, 4, 6])
+    spanning = next(os.path.basename(source)[:-4] for source in sources
+                    if len(_spans(base_output_path, os.path.basename(source)[:-4])) > 1)
+    replacement = make_source(str(tmp_path / f"{spanning}.pdf"), 2, 99)
+    output_paths = rebuild_bundle(base_output_path, name=spanning, source=replacement, limit_size=LIMIT)
+    expected = [replacement if os.path.basename(source)[:-4] == spanning else source for source in sources]
+    check_bundle(output_paths, expected, LIMIT)
+    _check_previous(previous)
+
+
+def test_insert_resplits_part(tmp_path):
+    sources, base_output_path, previous = _bundle(tmp_path, [3, 5, 2, 4, 6])
+    parts_before = len(_parts(base_output_path))
+    inserted = make_source(str(tmp_path / "input" / "ア01x.pdf"), 5, 98)
+    output_paths = rebuild_bundle(base_output_path, source=inserted, limit_size=LIMIT)
+    assert len(output_paths) - 1 > parts_before
+    check_bundle(output_paths, sources[:2] + [inserted] + sources[2:], LIMIT)
+    _check_previous(previous)
+
+
+def test_insert_at_end(tmp_path):
+    sources, base_output_path, previous = _bundle(tmp_path, [3, 5, 2, 4, 1])
+    inserted = make_source(str(tmp_path / "input" / "イトウ.pdf"), 1, 97)
+    output_paths = rebuild_bundle(base_output_path, source=inserted, limit_size=LIMIT)
+    check_bundle(output_paths, sources + [inserted], LIMIT)
+    assert _spans(base_output_path, 'イトウ')[0]['part'] == len(output_paths) - 1
+    _check_previous(previous)
+
+
+def test_delete_last_applicant_removes_outputs(tmp_path):
+    sources, base_output_path, previous = _bundle(tmp_path, [2])
+    assert rebuild_bundle(base_output_path, name='ア00', limit_size=LIMIT) == []
+    assert os.listdir(tmp_path / "output") == []
+    _check_previous(previous)
@@ -0,0 +1,42 @@
+from bundles import check_bundle, make_sources, write_bundle
+
+from hr_assist import merge
+
+
+def test_parts_follow_index_and_limit(tmp_path):
+    sources = make_sources(tmp_path, [3, 5, 2, 4, 6])
+    output_paths = write_bundle(sources, str(tmp_path / "部_ア行.pdf"), 300 * 1024)
+    assert len(output_paths) > 2
+    check_bundle(output_paths, sources, 300 * 1024)
+
+
+def test_parts_stay_under_limit_when_estimate_is_wrong(tmp_path):
+    # 見積もりを実際の1/100にして、保存後の二分探索と残りのページの繰り越しを通す
+    sources = make_sources(tmp_path, [4, 6, 3, 5])
+    output_paths = write_bundle(sources, str(tmp_path / "部_ア行.pdf"), 250 * 1024,
+                                costs=lambda doc: [(600, {}) for _ in doc])
+    assert len(output_paths) > 2
+    check_bundle(output_paths, sources, 250 * 1024)
+
+
+def test_single_part_has_no_number(tmp_path):
+    sources = make_sources(tmp_path, [1, 2])
+    output_paths = write_bundle(sources, str(tmp_path / "部_ア行.pdf"), 10 * 1024 * 1024)
+    assert output_paths[0] == str(tmp_path / "部_ア行.pdf")
+    check_bundle(output_paths, sources, None)
+
+
+def test_rirekisho_folder_is_not_split(tmp_path, monkeypatch):
+    monkeypatch.setattr(merge, 'LIMIT_SIZE', 200 * 1024)
+    sources = make_sources(tmp_path, [4, 5, 3])
+    for subfolder_name in ('営業部', '履歴書'):
+        output_folder = tmp_path / subfolder_name
+        output_folder.mkdir()
+        statuses, output_paths, _ = merge.merge_group(subfolder_name, 'ア行', sources, str(output_folder))
+        assert all(status.state == '結合済' for status in statuses)
+        if subfolder_name == '履歴書':
+            assert output_paths[0] == str(output_folder / "履歴書_ア行.pdf") and len(output_paths) == 2
+            check_bundle(output_paths, sources, None)
+        else:
+            assert len(output_paths) > 2
+            check_bundle(output_paths, sources, 200 * 1024)